@@ -0,0 +1,313 @@
+from pitch import NOTE_NAMES
+
+# Base chord qualities as intervals above the root, in order of preference on ties.
+# The suffix is used for chord symbols, upper/lower decides the Roman numeral case.
+QUALITIES = [
+    ("maj", "", (0, 4, 7), True),
+    ("min", "m", (0, 3, 7), False),
+    ("7", "7", (0, 4, 7, 10), True),
+    ("maj7", "maj7", (0, 4, 7, 11), True),
+    ("min7", "m7", (0, 3, 7, 10), False),
+    ("dim", "dim", (0, 3, 6), False),
+    ("dim7", "dim7", (0, 3, 6, 9), False),
+    ("m7b5", "m7b5", (0, 3, 6, 10), False),
+    ("aug", "aug", (0, 4, 8), True),
+    ("minmaj7", "mmaj7", (0, 3, 7, 11), False),
+    ("6", "6", (0, 4, 7, 9), True),
+    ("min6", "m6", (0, 3, 7, 9), False),
+    ("aug7", "aug7", (0, 4, 8, 10), True),
+    ("sus4", "sus4", (0, 5, 7), True),
+    ("7sus4", "7sus4", (0, 5, 7, 10), True),
+    ("sus2", "sus2", (0, 2, 7), True),
+    ("5", "5", (0, 7), True),
+]
+EXTENSIONS = {1: "b9", 2: "9", 3: "#9", 5: "11", 6: "#11", 8: "b13", 9: "13"}
+MAJOR_DEGREES = {0: "I", 1: "bII", 2: "II", 3: "bIII", 4: "III", 5: "IV", 6: "#IV", 7: "V", 8: "bVI", 9: "VI",
+                 10: "bVII", 11: "VII"}
+MINOR_DEGREES = {0: "I", 1: "bII", 2: "II", 3: "III", 4: "#III", 5: "IV", 6: "#IV", 7: "V", 8: "VI", 9: "#VI",
+                 10: "VII", 11: "#VII"}
+TRIAD_FIGURES = ("", "6", "64")
+SEVENTH_FIGURES = ("7", "65", "43", "42")
+SEVENTHS = {"7", "maj7", "min7", "dim7", "m7b5", "minmaj7", "aug7"}
+TRIAD_FIGURE_SUFFIXES = ("", "°", "+")  # numerals that can take an inversion figure without clashing
+NUMERAL_SUFFIXES = {"dim": "°", "dim7": "°7", "m7b5": "ø7", "aug": "+", "aug7": "+7", "maj7": "maj7",
+                    "minmaj7": "maj7", "6": "add6", "min6": "add6", "sus4": "sus4", "7sus4": "7sus4",
+                    "sus2": "sus2", "5": "5"}
+BASS_ROOT_MARGIN = 0.5  # a chord rooted on the bass wins over a better one within this score
+
+# Krumhansl-Kessler key profiles, tonic first
+MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+
+
+def _rotate(mask, steps):
+    # Pitch-class set mask re-expressed relative to pitch class `steps`
+    return ((mask >> steps) | (mask << (12 - steps))) & 0xFFF
+
+
+def _best_rooted(relative):
+    # Best quality for a pitch-class set whose root is pitch class 0
+    best = None
+    # The perfect fifth may be left out of any voicing that has one, as long as three pitch
+    # classes remain (otherwise a bare fifth would read as an inverted sus4)
+    omit_fifth = bin(relative).count("1") >= 3
+    for priority, (quality, _, intervals, _) in enumerate(QUALITIES):
+        template = sum(1 << interval for interval in intervals)
+        core = template & ~(1 << 7) if omit_fifth and 7 in intervals and len(intervals) > 2 else template
+        if core & relative != core:
+            continue
+        extras = relative & ~template
+        extensions = [interval for interval in EXTENSIONS if extras >> interval & 1]
+        if extras != sum(1 << interval for interval in extensions):
+            continue
+        if 3 in extensions and 4 not in intervals:
+            continue
+        matched = bin(template & relative).count("1")
+        score = 3 * matched - 2 * len(extensions) - 0.01 * priority
+        if best is None or score > best[0]:
+            best = (score, priority, tuple(EXTENSIONS[interval] for interval in extensions))
+    return best
+
+
+_ROOTED = None
+_TABLE = None
+
+
+def rooted_table():
+    # 4096 entries, one per pitch-class set with pitch class 0 as its root:
+    # (score, priority, extensions) or None
+    global _ROOTED
+    if _ROOTED is None:
+        rooted = [None] * 4096
+        for relative in range(1, 4096, 2):
+            rooted[relative] = _best_rooted(relative)
+        _ROOTED = rooted
+    return _ROOTED
+
+
+def chord_table():
+    # 4096 entries, one per pitch-class set: (score, root, quality index, extensions) or None.
+    # Each rooted shape is solved once and every rotation of it is filled in from that.
+    global _TABLE
+    if _TABLE is None:
+        rooted = rooted_table()
+        table = [None] * 4096
+        for mask in range(1, 4096):
+            best = None
+            for root in range(12):
+                if mask >> root & 1:
+                    match = rooted[_rotate(mask, root)]
+                    if match is not None and (best is None or match[0] > best[0]):
+                        best = (match[0], root, match[1], match[2])
+            table[mask] = best
+        _TABLE = table
+    return _TABLE
+
+
+def pitch_class_mask(pitches):
+    mask = 0
+    for pitch in pitches:
+        mask |= 1 << (pitch % 12)
+    return mask
+
+
+class ChordAnalysis:
+    __slots__ = ("root", "quality", "inversion", "extensions", "bass")
+
+    def __init__(self, root, quality, inversion, extensions, bass):
+        self.root = root  # pitch class, or None if the chord could not be identified
+        self.quality = quality
+        self.inversion = inversion  # 0 root position, 1 first, ...; -1 for a non-chord-tone bass
+        self.extensions = extensions
+        self.bass = bass  # pitch class of the lowest note
+
+    @property
+    def symbol(self):
+        if self.root is None:
+            return "?"
+        suffix = QUALITIES[self.quality][1]
+        if self.extensions:
+            suffix += "(" + ",".join(self.extensions) + ")"
+        if self.bass != self.root:
+            suffix += "/" + NOTE_NAMES[self.bass]
+        return NOTE_NAMES[self.root] + suffix
+
+    def numeral(self, tonic, mode):
+        if self.root is None:
+            return "?"
+        degrees = MAJOR_DEGREES if mode == "major" else MINOR_DEGREES
+        numeral = degrees[(self.root - tonic) % 12]
+        quality, _, _, upper = QUALITIES[self.quality]
+        if not upper:
+            numeral = numeral.lower()
+        suffix = NUMERAL_SUFFIXES.get(quality, "")
+        if quality in SEVENTHS:
+            # Seventh chords carry their inversion in the figure: 7, 65, 43, 42
+            figure = SEVENTH_FIGURES[self.inversion] if self.inversion > 0 else "7"
+            suffix = suffix[:-1] + figure if suffix.endswith("7") else suffix + figure
+        elif 0 < self.inversion < len(TRIAD_FIGURES) and suffix in TRIAD_FIGURE_SUFFIXES:
+            suffix += TRIAD_FIGURES[self.inversion]
+        return numeral + suffix
+
+    def __repr__(self):
+        return f"ChordAnalysis({self.symbol})"
+
+
+_ANALYSIS_CACHE = {}
+
+
+def analyse_chord(pitches):
+    # pitches: bytes or sequence of ints, in any order; memoized per distinct chord
+    key = pitches if isinstance(pitches, bytes) else bytes(pitches)
+    result = _ANALYSIS_CACHE.get(key)
+    if result is None:
+        if not key:
+            result = ChordAnalysis(None, None, -1, (), None)
+        else:
+            bass = min(key) % 12
+            mask = pitch_class_mask(key)
+            entry = chord_table()[mask]
+            if entry is None:
+                result = ChordAnalysis(None, None, -1, (), bass)
+            else:
+                score, root, quality, extensions = entry
+                if root != bass:
+                    # Near-ties go to the reading rooted on the bass: C E G A over C is C6, not Am7/C
+                    match = rooted_table()[_rotate(mask, bass)]
+                    if match is not None and match[0] >= score - BASS_ROOT_MARGIN:
+                        root, quality, extensions = bass, match[1], match[2]
+                intervals = QUALITIES[quality][2]
+                bass_interval = (bass - root) % 12
+                inversion = intervals.index(bass_interval) if bass_interval in intervals else -1
+                result = ChordAnalysis(root, quality, inversion, extensions, bass)
+        if len(_ANALYSIS_CACHE) < 65536:
+            _ANALYSIS_CACHE[key] = result
+    return result
+
+
+def _profile_scores(histogram):
+    # Pearson correlation of the histogram against all 24 rotated key profiles
+    mean = sum(histogram) / 12.0
+    centred = [value - mean for value in histogram]
+    norm = sum(value * value for value in centred) ** 0.5
+    scores = []
+    for mode, profile in (("major", MAJOR_PROFILE), ("minor", MINOR_PROFILE)):
+        profile_mean = sum(profile) / 12.0
+        profile_centred = [value - profile_mean for value in profile]
+        profile_norm = sum(value * value for value in profile_centred) ** 0.5
+        for tonic in range(12):
+            dot = sum(centred[(tonic + i) % 12] * profile_centred[i] for i in range(12))
+            scores.append((dot / (norm * profile_norm) if norm else 0.0, tonic, mode))
+    return scores
+
+
+def detect_key(histogram):
+    # -> (tonic pitch class, "major"/"minor", correlation)
+    score, tonic, mode = max(_profile_scores(histogram))
+    return tonic, mode, score
+
+
+def key_name(tonic, mode):
+    return f"{NOTE_NAMES[tonic]} {mode}"
+
+
+class SongAnalysis:
+    # Keeps chord analyses and the key histogram in step with a song, re-analysing only
+    # the chords that changed since the last update.
+    def __init__(self):
+        self.sources = []  # the Chord objects analysed, compared by identity
+        self.chords = []  # ChordAnalysis per chord
+        self.histogram = [0.0] * 12  # beat-weighted pitch-class counts
+        self.key = None
+
+    def update(self, song):
+        song = list(song)
+        old = self.sources
+        prefix = 0
+        limit = min(len(old), len(song))
+        while prefix < limit and old[prefix] is song[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] is song[-1 - suffix]:
+            suffix += 1
+
+        removed = old[prefix:len(old) - suffix]
+        added = song[prefix:len(song) - suffix]
+        if not removed and not added:
+            return self
+        for chord in removed:
+            self._count(chord, -1.0)
+        for chord in added:
+            self._count(chord, 1.0)
+        self.chords[prefix:len(old) - suffix] = [analyse_chord(chord.pitches) for chord in added]
+        self.sources = song
+        self.key = detect_key(self.histogram) if song else None
+        return self
+
+    def append(self, chord):
+        self.sources.append(chord)
+        self.chords.append(analyse_chord(chord.pitches))
+        self._count(chord, 1.0)
+        self.key = detect_key(self.histogram)
+        return self
+
+    def clear(self):
+        self.__init__()
+
+    def _count(self, chord, sign):
+        weight = sign * chord.beats
+        for pitch in chord.pitches:
+            self.histogram[pitch % 12] += weight
+
+    def symbols(self):
+        return [analysis.symbol for analysis in self.chords]
+
+    def numerals(self):
+        if self.key is None:
+            return []
+        tonic, mode, _ = self.key
+        return [analysis.numeral(tonic, mode) for analysis in self.chords]
+
+    def key_name(self):
+        return "" if self.key is None else key_name(self.key[0], self.key[1])
+
+
+def analyse_songs(songs):
+    # Batch analysis of many songs (each an iterable of Chords): keys are found for all songs
+    # at once from a beat-weighted pitch-class histogram matrix.
+    import numpy as np
+
+    songs = [list(song) for song in songs]
+    chords = [chord for song in songs for chord in song]
+    lengths = np.fromiter((len(chord.pitches) for chord in chords), dtype=np.int64, count=len(chords))
+    beats = np.fromiter((chord.beats for chord in chords), dtype=np.float64, count=len(chords))
+    song_of_chord = np.repeat(np.arange(len(songs)), [len(song) for song in songs])
+    pitches = np.frombuffer(b"".join(chord.pitches for chord in chords), dtype=np.uint8)
+
+    bins = np.repeat(song_of_chord, lengths) * 12 + pitches % 12
+    histograms = np.bincount(bins, weights=np.repeat(beats, lengths),
+                             minlength=len(songs) * 12).reshape(len(songs), 12)
+
+    profiles = []
+    for profile in (MAJOR_PROFILE, MINOR_PROFILE):
+        for tonic in range(12):
+            profiles.append(np.roll(profile, tonic))
+    profiles = np.array(profiles)
+    profiles = profiles - profiles.mean(axis=1, keepdims=True)
+    profiles /= np.linalg.norm(profiles, axis=1, keepdims=True)
+    centred = histograms - histograms.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centred, axis=1, keepdims=True)
+    correlations = (centred / np.where(norms == 0, 1.0, norms)) @ profiles.T
+    best = correlations.argmax(axis=1)
+
+    results = []
+    for song_idx, song in enumerate(songs):
+        tonic = int(best[song_idx] % 12)
+        mode = "major" if best[song_idx] < 12 else "minor"
+        analyses = [analyse_chord(chord.pitches) for chord in song]
+        results.append({
+            "key": key_name(tonic, mode) if song else "",
+            "chords": [analysis.symbol for analysis in analyses],
+            "numerals": [analysis.numeral(tonic, mode) for analysis in analyses] if song else [],
+        })
+    return results
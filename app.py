@@ -1,6 +1,99 @@
+import time
 import tkinter as tk
-from tkinter import ttk, simpledialog
+from tkinter import ttk, simpledialog, filedialog, messagebox
+from tkinter import font as tkfont
 from instruments import Fretboard, Sheet_Music
+from pitch import PITCH_LABELS, Chord
+
+SONG_EXTENSION = ".hsng"
+SONG_FILE_TYPES = [("Harmonic songs", "*.hsng"), ("JSON song export", "*.json"), ("MIDI files", "*.mid *.midi"),
+                   ("All files", "*.*")]
+STATS_FILE_TYPES = [("JSON", "*.json"), ("CSV", "*.csv")]
+STATS_REFRESH_MS = 500
+
+
+class VirtualChordList(ttk.Frame):
+    # A listbox that only holds the rows currently on screen, so very long songs stay
+    # interactive. row_text(index) is asked for the text of a row when it scrolls into view.
+    def __init__(self, parent, row_text, height=10):
+        super().__init__(parent)
+        self.row_text = row_text
+        self.row_count = 0
+        self.first_row = 0
+        self.visible_rows = height
+        self.rendered = []  # texts currently in the listbox, top to bottom
+        
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox = tk.Listbox(self, height=height, activestyle="none", font=("Courier", 11))
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.line_height = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+        
+        self.listbox.bind("<Configure>", self.on_resize)
+        self.listbox.bind("<MouseWheel>", lambda event: self.scroll("scroll", -event.delta // 120, "units"))
+        self.listbox.bind("<Button-4>", lambda event: self.scroll("scroll", -1, "units"))
+        self.listbox.bind("<Button-5>", lambda event: self.scroll("scroll", 1, "units"))
+    
+    def set_row_count(self, row_count):
+        # Follow the end of the list if it was showing the last row
+        following = self.first_row + self.visible_rows >= self.row_count
+        self.row_count = row_count
+        if following:
+            self.first_row = row_count - self.visible_rows
+        self.render()
+    
+    def selected_index(self):
+        selection = self.listbox.curselection()
+        return self.first_row + selection[0] if selection else None
+    
+    def select(self, index):
+        # Scroll row `index` into view and highlight it
+        if not 0 <= index < self.row_count:
+            return
+        if index < self.first_row:
+            self.first_row = index
+        elif index >= self.first_row + self.visible_rows:
+            self.first_row = index - self.visible_rows + 1
+        self.render()
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index - self.first_row)
+    
+    def scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first_row = int(float(amount) * self.row_count)
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.first_row += int(amount) * step
+        self.render()
+    
+    def on_resize(self, event):
+        visible_rows = max(1, event.height // self.line_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.render()
+    
+    def render(self):
+        self.first_row = max(0, min(self.first_row, self.row_count - self.visible_rows))
+        last_row = min(self.first_row + self.visible_rows, self.row_count)
+        texts = [self.row_text(index) for index in range(self.first_row, last_row)]
+        
+        # Touch only the listbox rows whose text actually changed
+        for position, text in enumerate(texts):
+            if position < len(self.rendered):
+                if self.rendered[position] != text:
+                    self.listbox.delete(position)
+                    self.listbox.insert(position, text)
+            else:
+                self.listbox.insert(tk.END, text)
+        if len(self.rendered) > len(texts):
+            self.listbox.delete(len(texts), tk.END)
+        self.rendered = texts
+        
+        if self.row_count:
+            self.scrollbar.set(self.first_row / self.row_count, last_row / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
 
 class HarmonicAnalysisApp:
     def __init__(self, root):
@@ -14,17 +107,32 @@ class HarmonicAnalysisApp:
         
         # Selected notes for the current chord
         self.current_chord = []
+        self.lit_positions = set()  # (string, fret) of the highlighted fretboard ovals
+        self.screens = {}
+        self.current_screen = None
+        self.stats = self.fretboard.stats
+        self.stats_refresh = None  # pending after() id while the stats panel is shown
         
         # Initial welcome screen
         self.show_welcome_screen()
     
+    def show_screen(self, name, build):
+        # Screens are built once and then swapped in and out instead of being rebuilt
+        if name not in self.screens:
+            self.screens[name] = build()
+        for screen_name, screen in self.screens.items():
+            if screen_name != name:
+                screen.pack_forget()
+        self.screens[name].pack(expand=True, fill=tk.BOTH)
+        self.current_screen = name
+        return self.screens[name]
+    
     def show_welcome_screen(self):
-        # Clear existing widgets
-        for widget in self.root.winfo_children():
-            widget.destroy()
-        
+        self.sheet_music.stop_song()
+        self.show_screen("welcome", self.build_welcome_screen)
+    
+    def build_welcome_screen(self):
         welcome_frame = ttk.Frame(self.root, padding="20")
-        welcome_frame.pack(expand=True, fill=tk.BOTH)
         
         title_label = ttk.Label(welcome_frame, text="Harmonic Analysis Tool", font=("Arial", 24))
         title_label.pack(pady=20)
@@ -32,8 +140,12 @@ class HarmonicAnalysisApp:
         add_song_button = ttk.Button(welcome_frame, text="Add New Song", command=self.setup_new_song)
         add_song_button.pack(pady=10)
         
+        open_song_button = ttk.Button(welcome_frame, text="Open Song", command=self.open_song)
+        open_song_button.pack(pady=10)
+        
         exit_button = ttk.Button(welcome_frame, text="Exit", command=self.root.quit)
         exit_button.pack(pady=10)
+        return welcome_frame
     
     def setup_new_song(self):
         # Get song name
@@ -41,74 +153,164 @@ class HarmonicAnalysisApp:
         if not song_name:
             song_name = "Untitled"
         
-        self.sheet_music.set_song_name(song_name)
+        self.sheet_music.new_song(song_name)
         
         # Choose tuning
         self.show_tuning_selection()
     
     def show_tuning_selection(self):
-        # Clear existing widgets
-        for widget in self.root.winfo_children():
-            widget.destroy()
-        
+        self.show_screen("tuning", self.build_tuning_selection)
+    
+    def build_tuning_selection(self):
         tuning_frame = ttk.Frame(self.root, padding="20")
-        tuning_frame.pack(expand=True, fill=tk.BOTH)
         
         title_label = ttk.Label(tuning_frame, text="Select Guitar Tuning", font=("Arial", 18))
         title_label.pack(pady=20)
         
-        tunings = ["Standard", "Drop D", "Atmospheric", "Open G"]
-        tuning_var = tk.StringVar(value=tunings[0])
+        # The choices come from the tuning registry, so custom tunings show up here too
+        self.tuning_var = tk.StringVar(value=self.fretboard.current_tuning)
+        self.tuning_choices = ttk.Frame(tuning_frame)
+        self.tuning_choices.pack(anchor=tk.W)
+        self.list_tunings()
         
-        for tuning in tunings:
-            tuning_radio = ttk.Radiobutton(tuning_frame, text=tuning, value=tuning, variable=tuning_var)
-            tuning_radio.pack(anchor=tk.W, pady=5)
+        add_tuning_button = ttk.Button(tuning_frame, text="Add Custom Tuning...", command=self.add_custom_tuning)
+        add_tuning_button.pack(anchor=tk.W, pady=10)
+        
+        capo_frame = ttk.Frame(tuning_frame)
+        capo_frame.pack(anchor=tk.W, pady=5)
+        ttk.Label(capo_frame, text="Capo at fret:").pack(side=tk.LEFT)
+        self.capo_var = tk.StringVar(value="0")
+        ttk.Spinbox(capo_frame, from_=0, to=12, width=4, textvariable=self.capo_var).pack(side=tk.LEFT, padx=5)
         
         continue_button = ttk.Button(tuning_frame, text="Continue", 
-                                     command=lambda: self.setup_main_interface(tuning_var.get()))
+                                     command=lambda: self.setup_main_interface(self.tuning_var.get(),
+                                                                               self.selected_capo()))
         continue_button.pack(pady=20)
         
         back_button = ttk.Button(tuning_frame, text="Back", command=self.show_welcome_screen)
         back_button.pack()
+        return tuning_frame
+    
+    def list_tunings(self):
+        for child in self.tuning_choices.winfo_children():
+            child.destroy()
+        for tuning in self.fretboard.tunings:
+            tuning_radio = ttk.Radiobutton(self.tuning_choices, text=f"{tuning.name}  ({tuning.label()})",
+                                           value=tuning.name, variable=self.tuning_var)
+            tuning_radio.pack(anchor=tk.W, pady=5)
+    
+    def add_custom_tuning(self):
+        name = simpledialog.askstring("Custom Tuning", "Tuning name:", parent=self.root)
+        if not name:
+            return
+        notes = simpledialog.askstring("Custom Tuning", "Open strings from the lowest up (e.g. D1 A1 D2 G2 A2 D3):",
+                                       parent=self.root)
+        if not notes:
+            return
+        registry = self.fretboard.tunings
+        try:
+            tuning = registry.register(name, notes, replace=True)
+            registry.save_custom()
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Custom Tuning", f"Could not add tuning: {str(e)}", parent=self.root)
+            return
+        self.list_tunings()
+        self.tuning_var.set(tuning.name)
+    
+    def selected_capo(self):
+        try:
+            return max(0, int(self.capo_var.get()))
+        except ValueError:
+            return 0
     
-    def setup_main_interface(self, tuning):
+    def setup_main_interface(self, tuning, capo=0):
         # Set the selected tuning
-        self.fretboard.set_tuning(tuning)
-        
-        # Clear existing widgets
-        for widget in self.root.winfo_children():
-            widget.destroy()
-        
+        try:
+            self.fretboard.set_tuning(tuning, capo)
+        except ValueError as e:
+            messagebox.showerror("Tuning", str(e), parent=self.root)
+            return
+        self.fretboard.prefetch_tuning()
+        
+        self.show_screen("main", self.build_main_interface)
+        
+        # Refresh the parts of the kept-alive screen that depend on the song and tuning
+        self.title_label.config(text=f"Song: {self.sheet_music.song_name}")
+        self.tuning_label.config(text=f"Tuning: {self.tuning_title()}")
+        self.sheet_music.tuning = self.fretboard.current_tuning
+        self.sheet_music.capo = self.fretboard.capo
+        self.tempo_var.set(f"{self.sheet_music.tempo:g}")
+        self.clear_selection()
+        self.relabel_fretboard()
+        self.update_chord_list()
+    
+    def tuning_title(self):
+        if self.fretboard.capo:
+            return f"{self.fretboard.current_tuning}, capo {self.fretboard.capo}"
+        return self.fretboard.current_tuning
+    
+    def build_main_interface(self):
         # Main container
         main_frame = ttk.Frame(self.root)
-        main_frame.pack(expand=True, fill=tk.BOTH)
         
         # Title and song info
         info_frame = ttk.Frame(main_frame)
         info_frame.pack(fill=tk.X, pady=5)
         
-        title_label = ttk.Label(info_frame, text=f"Song: {self.sheet_music.song_name}", font=("Arial", 14))
-        title_label.pack(side=tk.LEFT, padx=10)
+        self.title_label = ttk.Label(info_frame, text="", font=("Arial", 14))
+        self.title_label.pack(side=tk.LEFT, padx=10)
         
-        tuning_label = ttk.Label(info_frame, text=f"Tuning: {self.fretboard.current_tuning}", font=("Arial", 12))
-        tuning_label.pack(side=tk.RIGHT, padx=10)
+        self.tuning_label = ttk.Label(info_frame, text="", font=("Arial", 12))
+        self.tuning_label.pack(side=tk.RIGHT, padx=10)
         
-        # Create two main sections
-        self.create_fretboard_section(main_frame)
-        self.create_sheet_music_section(main_frame)
+        self.key_label = ttk.Label(info_frame, text="", font=("Arial", 12))
+        self.key_label.pack(side=tk.RIGHT, padx=10)
         
-        # Bottom control panel
+        # Bottom control panel, packed before the sections so it keeps its space when resizing
         control_frame = ttk.Frame(main_frame, padding="10")
         control_frame.pack(fill=tk.X, side=tk.BOTTOM)
         
         play_button = ttk.Button(control_frame, text="Play Song", command=self.play_full_song)
         play_button.pack(side=tk.LEFT, padx=5)
         
+        self.pause_button = ttk.Button(control_frame, text="Pause", command=self.toggle_pause)
+        self.pause_button.pack(side=tk.LEFT, padx=5)
+        
+        stop_button = ttk.Button(control_frame, text="Stop", command=self.stop_song)
+        stop_button.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(control_frame, text="Tempo (BPM):").pack(side=tk.LEFT, padx=(15, 2))
+        self.tempo_var = tk.StringVar(value=str(self.sheet_music.tempo))
+        tempo_spinbox = ttk.Spinbox(control_frame, from_=20, to=300, width=5, textvariable=self.tempo_var,
+                                    command=self.update_tempo)
+        tempo_spinbox.bind("<Return>", lambda event: self.update_tempo())
+        tempo_spinbox.pack(side=tk.LEFT, padx=5)
+        
         clear_button = ttk.Button(control_frame, text="Clear Song", command=self.clear_song)
         clear_button.pack(side=tk.LEFT, padx=5)
         
+        save_button = ttk.Button(control_frame, text="Save Song", command=self.save_song)
+        save_button.pack(side=tk.LEFT, padx=5)
+        
         new_song_button = ttk.Button(control_frame, text="New Song", command=self.show_welcome_screen)
         new_song_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.stats_button = ttk.Button(control_frame, text="Show Stats", command=self.toggle_stats)
+        self.stats_button.pack(side=tk.RIGHT, padx=5)
+        
+        # Playback stats panel, only packed (and only collecting) while toggled on
+        self.stats_frame = ttk.LabelFrame(main_frame, text="Playback Stats", padding="10")
+        self.stats_text = tk.Text(self.stats_frame, height=8, font=("Courier", 10), state=tk.DISABLED)
+        self.stats_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        stats_buttons = ttk.Frame(self.stats_frame)
+        stats_buttons.pack(side=tk.RIGHT, fill=tk.Y, padx=5)
+        ttk.Button(stats_buttons, text="Export...", command=self.export_stats).pack(pady=2)
+        ttk.Button(stats_buttons, text="Reset", command=self.reset_stats).pack(pady=2)
+        
+        # Create two main sections
+        self.create_fretboard_section(main_frame)
+        self.create_sheet_music_section(main_frame)
+        return main_frame
     
     def create_fretboard_section(self, parent):
         fretboard_frame = ttk.LabelFrame(parent, text="Guitar Fretboard", padding="10")
@@ -117,124 +319,315 @@ class HarmonicAnalysisApp:
         # Create fretboard display with explicit width
         self.fretboard_canvas = tk.Canvas(fretboard_frame, bg="white", height=150, width=1000)
         self.fretboard_canvas.pack(fill=tk.BOTH, expand=True)
+        self.draw_fretboard()
+        
+        # Control buttons
+        button_frame = ttk.Frame(fretboard_frame)
+        button_frame.pack(fill=tk.X, pady=5)
+        
+        add_chord_button = ttk.Button(button_frame, text="Add Chord", 
+                                     command=lambda: self.add_current_chord("Fretboard"))
+        add_chord_button.pack(side=tk.LEFT, padx=5)
+        
+        clear_button = ttk.Button(button_frame, text="Clear Selection", command=self.clear_selection)
+        clear_button.pack(side=tk.LEFT, padx=5)
+    
+    def draw_fretboard(self):
+        # Draws as many strings and frets as the current tuning and capo have; only needed
+        # again when that shape changes, otherwise relabel_fretboard is enough
+        canvas = self.fretboard_canvas
+        canvas.delete("all")
+        num_strings = self.fretboard.num_strings
+        num_frets = self.fretboard.fret_count
+        self.fretboard_shape = (num_strings, num_frets)
         
-        # Draw fretboard
         string_height = 20
         fret_width = 40
         start_x = 100  # Increased to make room for labels
         start_y = 25
+        canvas.config(height=start_y + num_strings * string_height + 5)
         
-        # Draw strings
-        for i in range(6):
+        # Draw strings, lowest string at the top
+        self.string_label_items = []
+        for i in range(num_strings):
             y = start_y + i * string_height
-            self.fretboard_canvas.create_line(start_x, y, start_x + fret_width * self.fretboard.num_frets, y, width=1 + (5-i)/2)
+            canvas.create_line(start_x, y, start_x + fret_width * num_frets, y,
+                               width=1 + (num_strings - 1 - i) / 2)
             
             # String label with note name and octave - make it more visible
-            note = self.fretboard.strings[i][0]
-            self.fretboard_canvas.create_text(80, y, text=f"{note['note_name']}{note['number']}", 
-                                           font=("Arial", 14, "bold"), fill="blue")
+            open_pitch = self.fretboard.strings[i][0]
+            label = canvas.create_text(80, y, text=PITCH_LABELS[open_pitch], 
+                                       font=("Arial", 14, "bold"), fill="blue")
+            self.string_label_items.append(label)
             
-            # String number (1-6, from bottom to top) - make it more visible
-            self.fretboard_canvas.create_text(40, y, text=str(6-i), font=("Arial", 14, "bold"), fill="red")
+            # String number (counting from the highest string) - make it more visible
+            canvas.create_text(40, y, text=str(num_strings - i), font=("Arial", 14, "bold"), fill="red")
         
         # Draw frets
-        for i in range(self.fretboard.num_frets + 1):
+        for i in range(num_frets + 1):
             x = start_x + i * fret_width
-            self.fretboard_canvas.create_line(x, start_y, x, start_y + 5 * string_height, width=2 if i == 0 else 1)
+            canvas.create_line(x, start_y, x, start_y + (num_strings - 1) * string_height, width=2 if i == 0 else 1)
             
-            # Fret number (starting from 0) - make it more visible
+            # Fret number (starting from 0, counted from the capo) - make it more visible
             if i > 0:  # Skip the 0th fret (nut)
-                self.fretboard_canvas.create_text(x - fret_width/2, 10, text=str(i-1), 
-                                               font=("Arial", 14, "bold"), fill="green")
+                canvas.create_text(x - fret_width/2, 10, text=str(i-1), 
+                                   font=("Arial", 14, "bold"), fill="green")
         
         # Add a title for the fretboard
-        self.fretboard_canvas.create_text(start_x + (fret_width * self.fretboard.num_frets)/2, 5,
-                                       text=f"Fretboard - {self.fretboard.current_tuning} Tuning",
-                                       font=("Arial", 16, "bold"), fill="purple")
+        self.fretboard_title_item = canvas.create_text(start_x + (fret_width * num_frets)/2, 5,
+                                                       text=f"Fretboard - {self.tuning_title()} Tuning",
+                                                       font=("Arial", 16, "bold"), fill="purple")
         
         # Create clickable positions
         self.fretboard_buttons = []
-        for string in range(6):
+        for string in range(num_strings):
             string_buttons = []
-            for fret in range(self.fretboard.num_frets):
+            for fret in range(num_frets):
                 x = start_x + fret * fret_width + fret_width/2
                 y = start_y + string * string_height
                 
-                note = self.fretboard.strings[string][fret]
-                button = self.fretboard_canvas.create_oval(x-8, y-8, x+8, y+8, fill="white", outline="black")
+                button = canvas.create_oval(x-8, y-8, x+8, y+8, fill="white", outline="black")
                 
                 # Bind click event
-                self.fretboard_canvas.tag_bind(button, "<Button-1>", 
-                                         lambda event, s=string, f=fret: self.select_fretboard_note(s, f))
+                canvas.tag_bind(button, "<Button-1>", 
+                                lambda event, s=string, f=fret: self.select_fretboard_note(s, f))
                 
                 string_buttons.append(button)
             self.fretboard_buttons.append(string_buttons)
-        
-        # Control buttons
-        button_frame = ttk.Frame(fretboard_frame)
-        button_frame.pack(fill=tk.X, pady=5)
-        
-        add_chord_button = ttk.Button(button_frame, text="Add Chord", 
-                                     command=lambda: self.add_current_chord("Fretboard"))
-        add_chord_button.pack(side=tk.LEFT, padx=5)
-        
-        clear_button = ttk.Button(button_frame, text="Clear Selection", command=self.clear_selection)
-        clear_button.pack(side=tk.LEFT, padx=5)
     
     def create_sheet_music_section(self, parent):
         sheet_frame = ttk.LabelFrame(parent, text="Sheet Music", padding="10")
         sheet_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
-        # Create listbox for chords
-        self.chord_listbox = tk.Listbox(sheet_frame, height=10)
-        self.chord_listbox.pack(fill=tk.BOTH, expand=True)
+        # Only the visible rows of the chord list exist as listbox entries
+        self.chord_list = VirtualChordList(sheet_frame, self.chord_row_text, height=10)
+        self.chord_list.pack(fill=tk.BOTH, expand=True)
         
-        # Update chord list
-        self.update_chord_list()
+        edit_frame = ttk.Frame(sheet_frame)
+        edit_frame.pack(fill=tk.X, pady=5)
+        
+        self.undo_button = ttk.Button(edit_frame, text="Undo", command=self.undo)
+        self.undo_button.pack(side=tk.LEFT, padx=5)
+        self.redo_button = ttk.Button(edit_frame, text="Redo", command=self.redo)
+        self.redo_button.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(edit_frame, text="Delete Chord", command=self.delete_selected_chord).pack(side=tk.LEFT, padx=5)
+        ttk.Button(edit_frame, text="Move Up", command=lambda: self.move_selected_chord(-1)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(edit_frame, text="Move Down", command=lambda: self.move_selected_chord(1)).pack(side=tk.LEFT, padx=5)
+        
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+        self.root.bind("<Control-Z>", lambda event: self.redo())
+    
+    def relabel_fretboard(self):
+        # A tuning change with the same number of strings and frets only alters the labels
+        if self.fretboard_shape != (self.fretboard.num_strings, self.fretboard.fret_count):
+            self.draw_fretboard()
+            return
+        for label, string in zip(self.string_label_items, self.fretboard.strings):
+            self.fretboard_canvas.itemconfig(label, text=PITCH_LABELS[string[0]])
+        self.fretboard_canvas.itemconfig(self.fretboard_title_item,
+                                         text=f"Fretboard - {self.tuning_title()} Tuning")
     
     def select_fretboard_note(self, string, fret):
+        # Stats time the click from here to the sound starting, when they are switched on
+        clicked = time.perf_counter() if self.stats.enabled else None
+        
         # Check if a note is already selected on this string
         for note in self.current_chord:
-            if note.get('string') == string:
+            if note.string == string:
                 # If a note is already selected on this string, deselect it first
-                self.fretboard_canvas.itemconfig(self.fretboard_buttons[string][note.get('fret')], fill="white")
+                self.fretboard_canvas.itemconfig(self.fretboard_buttons[string][note.fret], fill="white")
+                self.lit_positions.discard((string, note.fret))
                 self.current_chord.remove(note)
                 break
         
+        # The returned note already carries its string and fret
         note = self.fretboard.get_note_at_position(string, fret)
         if note:
-            # Add string and fret information to the note
-            note['string'] = string
-            note['fret'] = fret
+            found = time.perf_counter() if clicked is not None else None
+            self.fretboard.play_note(note, clicked, found)
             self.current_chord.append(note)
             # Highlight selected note in blue
             self.fretboard_canvas.itemconfig(self.fretboard_buttons[string][fret], fill="lightblue")
+            self.lit_positions.add((string, fret))
     
     def clear_selection(self):
         self.current_chord = []
-        # Reset button colors
-        for string in self.fretboard_buttons:
-            for button in string:
-                self.fretboard_canvas.itemconfig(button, fill="white")
+        # Reset only the ovals that are actually lit
+        for string, fret in self.lit_positions:
+            self.fretboard_canvas.itemconfig(self.fretboard_buttons[string][fret], fill="white")
+        self.lit_positions.clear()
     
     def add_current_chord(self, source):
         if self.current_chord:
-            self.sheet_music.add_chord(self.current_chord.copy())
+            self.sheet_music.add_chord(Chord.from_notes(self.current_chord))
             self.update_chord_list()
             self.clear_selection()
     
     def update_chord_list(self):
-        self.chord_listbox.delete(0, tk.END)
-        for chord in self.sheet_music.song:
-            chord_text = " ".join(f"{note['note_name']}{note['number']}" for note in chord)
-            self.chord_listbox.insert(tk.END, chord_text)
+        # Analysis is incremental and the list only re-renders visible rows whose text changed
+        analysis = self.sheet_music.analyse()
+        self.key_label.config(text=f"Key: {analysis.key_name()}" if analysis.key else "")
+        self.chord_list.set_row_count(len(self.sheet_music.song))
+        history = self.sheet_music.history
+        self.undo_button.config(text=f"Undo {history.undo_label()}" if history.can_undo else "Undo",
+                                state=tk.NORMAL if history.can_undo else tk.DISABLED)
+        self.redo_button.config(text=f"Redo {history.redo_label()}" if history.can_redo else "Redo",
+                                state=tk.NORMAL if history.can_redo else tk.DISABLED)
+    
+    def chord_row_text(self, index):
+        chord = self.sheet_music.song[index]
+        analysis = self.sheet_music.analysis
+        chord_analysis = analysis.chords[index]
+        numeral = chord_analysis.numeral(analysis.key[0], analysis.key[1]) if analysis.key else ""
+        return f"{index + 1:>5}  {chord.label():<24} {chord_analysis.symbol:<12} {numeral}"
     
     def clear_song(self):
+        self.sheet_music.stop_song()
         self.sheet_music.clear_song()
         self.update_chord_list()
     
+    def undo(self):
+        if self.current_screen == "main" and self.sheet_music.undo() is not None:
+            self.after_history_change()
+    
+    def redo(self):
+        if self.current_screen == "main" and self.sheet_music.redo() is not None:
+            self.after_history_change()
+    
+    def after_history_change(self):
+        # Undoing a retune brings back the old tuning and capo along with the chords
+        if (self.sheet_music.tuning, self.sheet_music.capo) != (self.fretboard.current_tuning, self.fretboard.capo):
+            self.setup_main_interface(self.sheet_music.tuning, self.sheet_music.capo)
+        else:
+            self.update_chord_list()
+    
+    def delete_selected_chord(self):
+        index = self.chord_list.selected_index()
+        if index is not None:
+            self.sheet_music.remove_chord(index)
+            self.update_chord_list()
+            self.chord_list.select(min(index, len(self.sheet_music.song) - 1))
+    
+    def move_selected_chord(self, step):
+        index = self.chord_list.selected_index()
+        if index is None or not 0 <= index + step < len(self.sheet_music.song):
+            return
+        self.sheet_music.move_chord(index, index + step)
+        self.update_chord_list()
+        self.chord_list.select(index + step)
+    
+    def save_song(self):
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=SONG_EXTENSION,
+                                            initialfile=self.sheet_music.song_name, filetypes=SONG_FILE_TYPES)
+        if not path:
+            return
+        try:
+            self.sheet_music.save_song(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Save Song", f"Could not save song: {str(e)}", parent=self.root)
+    
+    def open_song(self):
+        path = filedialog.askopenfilename(parent=self.root, filetypes=SONG_FILE_TYPES)
+        if not path:
+            return
+        try:
+            self.sheet_music.load_song(path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Open Song", f"Could not open song: {str(e)}", parent=self.root)
+            return
+        self.setup_main_interface(self.sheet_music.tuning, self.sheet_music.capo)
+    
     def play_full_song(self):
+        # The sequencer plays on its own thread so the UI stays responsive
+        self.update_tempo()
         self.sheet_music.play_song()
+        self.pause_button.config(text="Pause")
+    
+    def toggle_pause(self):
+        sequencer = self.sheet_music.sequencer
+        if sequencer is None:
+            return
+        if sequencer.playing:
+            self.sheet_music.pause_song()
+            self.pause_button.config(text="Resume")
+        else:
+            self.sheet_music.resume_song()
+            self.pause_button.config(text="Pause")
+    
+    def stop_song(self):
+        self.sheet_music.stop_song()
+        self.pause_button.config(text="Pause")
+    
+    def update_tempo(self):
+        try:
+            tempo = float(self.tempo_var.get())
+        except ValueError:
+            return
+        if tempo > 0:
+            self.sheet_music.set_tempo(tempo)
+    
+    def toggle_stats(self):
+        if self.stats.enabled:
+            self.stats.enable(False)
+            if self.stats_refresh is not None:
+                self.root.after_cancel(self.stats_refresh)
+                self.stats_refresh = None
+            self.stats_frame.pack_forget()
+            self.stats_button.config(text="Show Stats")
+        else:
+            self.stats.enable(True)
+            self.stats_frame.pack(fill=tk.X, side=tk.BOTTOM, padx=10, pady=5)
+            self.stats_button.config(text="Hide Stats")
+            self.refresh_stats()
+    
+    def refresh_stats(self):
+        summary = self.stats.summary(self.sheet_music.sounds, self.sheet_music.sequencer, self.sheet_music.voices)
+        voices = summary["voices"]
+        lines = [
+            f"played {summary['played']}   missing {summary['missing']}   "
+            f"stolen {voices['stolen']}   choked {voices['choked']}",
+            self.stats_line("click to sound", summary["click_latency_ms"]),
+            self.stats_line("  note lookup", summary["note_lookup_ms"]),
+            self.stats_line("  sample", summary["sample_ms"]),
+            self.stats_line("  play call", summary["play_call_ms"]),
+            self.stats_line("jitter", summary.get("scheduler_jitter_ms", {"count": 0})),
+            f"channels busy: mean {summary['busy_channels']['mean']:.1f}  max {summary['busy_channels']['max']}"
+            f" of {summary['busy_channels']['channels']}   voices busy {voices['busy']} of {voices['voices']}",
+        ]
+        cache = summary["sample_cache"]
+        hit_rate = f"{100 * cache['hit_rate']:.0f}%" if cache["hit_rate"] is not None else "-"
+        lines.append(f"sample cache: {cache['hits']} hits  {cache['misses']} misses ({hit_rate})  "
+                     f"{cache['loaded']} loaded, {cache['memory_used'] / 1048576:.1f} MB")
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete("1.0", tk.END)
+        self.stats_text.insert(tk.END, "\n".join(lines))
+        self.stats_text.config(state=tk.DISABLED)
+        self.stats_refresh = self.root.after(STATS_REFRESH_MS, self.refresh_stats)
+    
+    def stats_line(self, name, timing):
+        if not timing["count"]:
+            return f"{name:<15} -"
+        return (f"{name:<15} p50 {timing['p50']:7.2f} ms  p95 {timing['p95']:7.2f} ms  "
+                f"max {timing['max']:7.2f} ms  (n={timing['count']})")
+    
+    def reset_stats(self):
+        self.stats.reset()
+        self.sheet_music.voices.reset_counters()
+        sequencer = self.sheet_music.sequencer
+        if sequencer is not None:
+            sequencer.jitter.clear()
+    
+    def export_stats(self):
+        path = filedialog.asksaveasfilename(parent=self.root, defaultextension=".json",
+                                            initialfile="playback-stats", filetypes=STATS_FILE_TYPES)
+        if not path:
+            return
+        try:
+            self.stats.export(path, self.sheet_music.sounds, self.sheet_music.sequencer, self.sheet_music.voices)
+        except OSError as e:
+            messagebox.showerror("Export Stats", f"Could not export stats: {str(e)}", parent=self.root)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+# Run headless: no sound card and no visible windows are needed
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from instruments import Fretboard, Instrument, Sheet_Music
+from midi import export_midi, import_midi
+from pitch import Chord, PITCH_KEYS, pitch_of
+from sample_bank import SampleBank
+from tunings import get_tuning_registry
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+TOLERANCE = 1.25  # a benchmark regresses when it gets this much slower than the baseline
+NOISE_FLOOR = 2e-6  # seconds; differences below this are timer noise
+
+BENCHMARKS = []
+
+
+def benchmark(name, number=1, repeat=5):
+    # Register fn(); it may return a setup-free callable to time, or None to skip
+    def register(fn):
+        BENCHMARKS.append((name, fn, number, repeat))
+        return fn
+    return register
+
+
+def measure(run, number, repeat):
+    # Seconds per call: best and median over `repeat` rounds of `number` calls
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        timings.append((time.perf_counter() - start) / number)
+    return {"best": min(timings), "median": statistics.median(timings)}
+
+
+@benchmark("Instrument.set_notes (88 keys)", number=2000)
+def bench_set_notes():
+    instrument = Instrument()
+    first = pitch_of("A", 0)
+    return lambda: instrument.set_notes(88, first)
+
+
+@benchmark("Fretboard.set_tuning (all tunings)", number=500)
+def bench_set_tuning():
+    fretboard = Fretboard()
+    names = get_tuning_registry().names()
+
+    def run():
+        for name in names:
+            fretboard.set_tuning(name)
+    return run
+
+
+@benchmark("Fretboard.get_note_at_position (whole neck)", number=200)
+def bench_get_note():
+    fretboard = Fretboard()
+    positions = [(string, fret) for string in range(len(fretboard.strings)) for fret in range(fretboard.num_frets)]
+
+    def run():
+        for string, fret in positions:
+            fretboard.get_note_at_position(string, fret)
+    return run
+
+
+def large_song(chords=20000):
+    fretboard = Fretboard()
+    shape = [fretboard.get_note_at_position(string, fret) for string, fret in ((0, 3), (1, 2), (2, 0))]
+    chord = Chord.from_notes(shape)
+    sheet_music = Sheet_Music()
+    for _ in range(chords):
+        sheet_music.add_chord(chord)
+    return sheet_music, chord
+
+
+@benchmark("Sheet_Music.add_chord (20k-chord song)", number=2000)
+def bench_add_chord():
+    sheet_music, chord = large_song()
+
+    def run():
+        sheet_music.add_chord(chord)
+        sheet_music.remove_chord(len(sheet_music.song) - 1)
+    return run
+
+
+@benchmark("Sheet_Music.remove_chord (front of 20k-chord song)", number=500)
+def bench_remove_chord():
+    sheet_music, chord = large_song()
+
+    def run():
+        sheet_music.remove_chord(0)
+        sheet_music.add_chord(chord)
+    return run
+
+
+@benchmark("import_midi (3 MB file, 2000 distinct chords)", number=1, repeat=3)
+def bench_import_midi():
+    # Random chords across the neck: many do not fit on six strings and are left unplaced
+    fretboard = Fretboard()
+    generator = random.Random(0)
+    low, high = fretboard.strings[0].start, fretboard.strings[-1].stop
+    shapes = [Chord(sorted(generator.sample(range(low, high), generator.randint(1, 6))), None, None,
+                    generator.choice((0.25, 0.5, 1.0)))
+              for _ in range(2000)]
+    chords = [generator.choice(shapes) for _ in range(100000)]
+    directory = tempfile.mkdtemp(prefix="harmonic-bench-")
+    path = os.path.join(directory, "large.mid")
+    export_midi(path, chords, "Benchmark", 120)
+
+    def run():
+        import_midi(path, fretboard.strings, fretboard.fret_index)
+    run.cleanup = lambda: shutil.rmtree(directory, ignore_errors=True)
+    return run
+
+
+def write_silent_samples(directory, pitches, seconds=0.5, rate=44100):
+    frames = b"\0\0" * int(seconds * rate)
+    for pitch in pitches:
+        with wave.open(os.path.join(directory, f"{PITCH_KEYS[pitch]}.wav"), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(rate)
+            wav_file.writeframes(frames)
+
+
+@benchmark("SampleBank load of a tuning's samples (cold)", number=1, repeat=3)
+def bench_bind_notes():
+    try:
+        from sample_bank import get_mixer
+        get_mixer().init()
+    except Exception as e:
+        print(f"  skipped: no audio mixer ({e})")
+        return None
+    fretboard = Fretboard()
+    pitches = sorted({pitch for string in fretboard.strings for pitch in string})
+    directory = tempfile.mkdtemp(prefix="harmonic-bench-")
+    write_silent_samples(directory, pitches)
+
+    def run():
+        # A fresh bank without the disk cache measures full WAV decoding
+        bank = SampleBank(directory, use_disk_cache=False)
+        bank.scan()
+        for pitch in pitches:
+            bank.get(PITCH_KEYS[pitch])
+    run.cleanup = lambda: shutil.rmtree(directory, ignore_errors=True)
+    return run
+
+
+@benchmark("create_fretboard_section canvas build", number=5, repeat=5)
+def bench_canvas():
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+    except Exception as e:
+        print(f"  skipped: no display for Tk ({e})")
+        return None
+    root.withdraw()
+    from app import HarmonicAnalysisApp
+    app = HarmonicAnalysisApp(root)
+
+    def run():
+        frame = ttk.Frame(root)
+        app.create_fretboard_section(frame)
+        root.update_idletasks()
+        frame.destroy()
+    run.cleanup = root.destroy
+    return run
+
+
+def run_benchmarks(selected=None):
+    results = {}
+    for name, factory, number, repeat in BENCHMARKS:
+        if selected and not any(word.lower() in name.lower() for word in selected):
+            continue
+        print(name)
+        run = factory()
+        if run is None:
+            continue
+        try:
+            run()  # warm up caches and lazy imports before timing
+            results[name] = measure(run, number, repeat)
+        finally:
+            cleanup = getattr(run, "cleanup", None)
+            if cleanup is not None:
+                cleanup()
+        print(f"  best {results[name]['best'] * 1e6:10.1f} us   median {results[name]['median'] * 1e6:10.1f} us")
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # -> list of (name, baseline seconds, current seconds) that got slower than allowed
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result["best"] > previous["best"] * tolerance and result["best"] - previous["best"] > NOISE_FLOOR:
+            regressions.append((name, previous["best"], result["best"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the instrument model, audio and UI paths")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON baseline to compare against")
+    parser.add_argument("--save", action="store_true", help="record these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"allowed slowdown factor before flagging a regression (default {TOLERANCE})")
+    parser.add_argument("only", nargs="*", help="run only benchmarks whose name contains one of these words")
+    options = parser.parse_args(argv)
+
+    results = run_benchmarks(options.only)
+
+    baseline = None
+    if os.path.exists(options.baseline):
+        with open(options.baseline, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    if options.save or baseline is None:
+        # Merge so a partial run does not drop the other benchmarks from the baseline
+        recorded = dict(baseline["results"]) if baseline else {}
+        recorded.update(results)
+        with open(options.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump({"python": sys.version.split()[0], "platform": platform.platform(),
+                       "results": recorded}, baseline_file, indent=2)
+        print(f"Baseline written to {options.baseline}")
+        return 0
+
+    regressions = compare(results, baseline["results"], options.tolerance)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before * 1e6:.1f} us -> {after * 1e6:.1f} us ({after / before:.2f}x)")
+    if not regressions:
+        print("No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
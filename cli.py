@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from instruments import Sheet_Music
+
+SONG_EXTENSIONS = (".hsng", ".json", ".mid", ".midi")
+
+
+def find_songs(paths):
+    # Expand directories into the song files they contain, keeping the given order.
+    # -> list of (path, name to write results under): songs found in a directory keep
+    # their path below it, so same-named songs in different subdirectories stay apart.
+    songs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for name in sorted(file_names):
+                    if name.lower().endswith(SONG_EXTENSIONS):
+                        song = os.path.join(dir_path, name)
+                        songs.append((song, os.path.relpath(song, path)))
+        else:
+            songs.append((path, os.path.basename(path)))
+    return songs
+
+
+def load(path):
+    sheet_music = Sheet_Music()
+    sheet_music.load_song(path)
+    return sheet_music
+
+
+def output_paths(songs, output_dir, extension=None):
+    # One distinct output path per song, decided up front so parallel workers never write
+    # the same file. Names that still clash (small.hsng and small.mid both converting to
+    # small.json) get a -2, -3, ... suffix.
+    taken = set()
+    outputs = []
+    for _, name in songs:
+        base, song_extension = os.path.splitext(name)
+        if extension is not None:
+            song_extension = extension
+        out = os.path.join(output_dir, base + song_extension)
+        count = 1
+        while os.path.normcase(out) in taken:
+            count += 1
+            out = os.path.join(output_dir, f"{base}-{count}{song_extension}")
+        taken.add(os.path.normcase(out))
+        outputs.append(out)
+    return outputs
+
+
+def output_extension(options):
+    # Extension of the files a command writes; None keeps each song's own
+    if options.command == "convert":
+        return "." + options.to
+    if options.command == "render":
+        return ".wav"
+    return None
+
+
+# Each job runs in a worker process and returns a JSON-serialisable summary
+
+def analyse_chunk(paths, options):
+    # Takes a worker's whole chunk of songs, so their keys are found in one batch
+    from analysis import analyse_songs
+    results = [None] * len(paths)
+    loaded = []
+    for idx, path in enumerate(paths):
+        try:
+            loaded.append((idx, load(path)))
+        except (OSError, ValueError, KeyError) as e:
+            results[idx] = {"song": path, "error": str(e)}
+    if loaded:
+        analyses = analyse_songs(sheet_music.song for _, sheet_music in loaded)
+        for (idx, sheet_music), analysis in zip(loaded, analyses):
+            results[idx] = {"song": paths[idx], "name": sheet_music.song_name, **analysis}
+    return results
+
+
+def transpose_job(path, out, options):
+    sheet_music = load(path)
+    sheet_music.transpose(options.semitones)
+    sheet_music.save_song(out)
+    return {"song": path, "output": out}
+
+
+def retune_job(path, out, options):
+    sheet_music = load(path)
+    sheet_music.retune(options.tuning, options.capo)
+    sheet_music.save_song(out)
+    return {"song": path, "output": out, "tuning": sheet_music.tuning, "capo": sheet_music.capo}
+
+
+def convert_job(path, out, options):
+    sheet_music = load(path)
+    sheet_music.save_song(out)
+    return {"song": path, "output": out}
+
+
+def render_job(path, out, options):
+    # NumPy is only imported by the jobs that need it
+    from renderer import SongRenderer, SOUNDS_DIR
+    sheet_music = load(path)
+    SongRenderer(options.sounds or SOUNDS_DIR).render_song(sheet_music, out)
+    return {"song": path, "output": out}
+
+
+JOBS = {
+    "transpose": transpose_job,
+    "retune": retune_job,
+    "convert": convert_job,
+    "render": render_job,
+}
+CHUNK_JOBS = {
+    "analyse": analyse_chunk,
+}
+
+
+def run_job(job):
+    command, path, out, options = job
+    try:
+        return JOBS[command](path, out, options)
+    except (OSError, ValueError, KeyError) as e:
+        return {"song": path, "error": str(e)}
+
+
+def run_chunk(job):
+    command, paths, options = job
+    return CHUNK_JOBS[command](paths, options)
+
+
+def run_batch(command, paths, outputs, options):
+    in_process = options.jobs == 1 or len(paths) < 2
+    workers = 1 if in_process else options.jobs or os.cpu_count() or 1
+    chunksize = len(paths) if in_process else max(1, len(paths) // (4 * workers))
+    if command in CHUNK_JOBS:
+        chunks = [(command, paths[start:start + chunksize], options) for start in range(0, len(paths), chunksize)]
+        if in_process:
+            return [result for chunk in chunks for result in run_chunk(chunk)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return [result for results in executor.map(run_chunk, chunks) for result in results]
+
+    jobs = [(command, path, out, options) for path, out in zip(paths, outputs)]
+    if in_process:
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_job, jobs, chunksize=chunksize))
+
+
+def play(options):
+    # The only command that opens the audio device
+    sheet_music = load(options.song)
+    sequencer = sheet_music.play_song(blocking=True)
+    return 0 if sequencer is not None else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="harmonic", description="Headless batch tools for Harmonic songs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def batch_command(name, help_text, needs_output=True):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument("paths", nargs="+", help="song files or directories of songs")
+        subparser.add_argument("-j", "--jobs", type=int, default=None,
+                               help="worker processes (default: one per CPU, 1 runs in-process)")
+        if needs_output:
+            subparser.add_argument("-o", "--output", required=True, help="directory for the results")
+        return subparser
+
+    batch_command("analyse", "print key, chord symbols and Roman numerals", needs_output=False)
+    transpose = batch_command("transpose", "transpose songs by a number of semitones")
+    transpose.add_argument("-s", "--semitones", type=int, required=True)
+    retune = batch_command("retune", "move songs' fret positions to another tuning and/or capo")
+    retune.add_argument("-t", "--tuning", default=None)
+    retune.add_argument("-c", "--capo", type=int, default=None, help="capo fret (0 for none)")
+    convert = batch_command("convert", "convert between the binary, JSON and MIDI song formats")
+    convert.add_argument("--to", choices=("hsng", "json", "mid"), required=True)
+    render = batch_command("render", "render songs to WAV files")
+    render.add_argument("--sounds", default=None, help="directory of Note+Octave.wav samples")
+
+    play_parser = subparsers.add_parser("play", help="play a song through the sound card")
+    play_parser.add_argument("song")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    options = parser.parse_args(argv)
+    if options.command == "retune" and options.tuning is None and options.capo is None:
+        parser.error("retune needs --tuning and/or --capo")
+    if options.command == "play":
+        return play(options)
+
+    songs = find_songs(options.paths)
+    if not songs:
+        print("No song files found", file=sys.stderr)
+        return 1
+    paths = [path for path, _ in songs]
+    if getattr(options, "output", None):
+        outputs = output_paths(songs, options.output, output_extension(options))
+        for directory in sorted({os.path.dirname(out) for out in outputs}):
+            os.makedirs(directory, exist_ok=True)
+    else:
+        outputs = [None] * len(paths)
+
+    failed = 0
+    for result in run_batch(options.command, paths, outputs, options):
+        if "error" in result:
+            failed += 1
+            print(f"{result['song']}: {result['error']}", file=sys.stderr)
+        else:
+            print(json.dumps(result))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
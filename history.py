@@ -0,0 +1,44 @@
+class EditHistory:
+    # Undo/redo stacks of snapshots. Snapshots are whatever the owner hands in (for a song:
+    # its persistent chord list plus tuning and capo), so an entry costs only what changed.
+    def __init__(self):
+        self.undo_stack = []  # (snapshot before the edit, label)
+        self.redo_stack = []  # (snapshot before the undo, label)
+
+    def record(self, snapshot, label):
+        # Call before making an edit, with the state it is about to replace
+        self.undo_stack.append((snapshot, label))
+        self.redo_stack.clear()
+
+    def undo(self, current):
+        # -> (snapshot to restore, label), or None when there is nothing to undo
+        if not self.undo_stack:
+            return None
+        snapshot, label = self.undo_stack.pop()
+        self.redo_stack.append((current, label))
+        return snapshot, label
+
+    def redo(self, current):
+        if not self.redo_stack:
+            return None
+        snapshot, label = self.redo_stack.pop()
+        self.undo_stack.append((current, label))
+        return snapshot, label
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo_label(self):
+        return self.undo_stack[-1][1] if self.undo_stack else None
+
+    def redo_label(self):
+        return self.redo_stack[-1][1] if self.redo_stack else None
@@ -1,201 +1,472 @@
+import threading
 import time
-import os
-from pygame import mixer
-from pygame.mixer import Sound
+from sample_bank import get_sample_bank
+from stats import get_stats
+from voices import get_voice_manager
+from sequencer import Sequencer
+from analysis import SongAnalysis
+from history import EditHistory
+from persistent import PersistentList
+from song_file import export_json, import_json, load_song, save_song
+from midi import GUITAR_OCTAVE_SHIFT, MIDI_EXTENSIONS, export_midi, import_midi
+from tunings import DEFAULT_FRETS, DEFAULT_TUNING, get_tuning_registry
+from voicings import find_voicings, place_chord
+from pitch import NO_POSITION, NOTE_NAMES, NUM_PITCHES, PITCH_KEYS, Chord, Note, as_pitch, pitch_of
+
+
+def refret_chord(chord, semitones, strings, fret_index, shift=0, string_offset=0):
+    # Shift a chord's pitches and place it on a tuning layout (strings/fret_index from the
+    # tuning registry). Placed notes keep their strings while the new frets exist; otherwise
+    # the chord moves to the nearest playable shape: the same pitches on other strings, or
+    # failing that the closest voicing of the chord. shift is how many frets the old shape
+    # moves along the neck, which is where "nearest" is measured from; string_offset is added
+    # to every string index when moving between instruments with different string counts.
+    if chord.pitches and not (0 <= min(chord.pitches) + semitones and max(chord.pitches) + semitones < NUM_PITCHES):
+        raise ValueError(f"Transposing by {semitones} semitones leaves the supported pitch range")
+    pitches = bytes(pitch + semitones for pitch in chord.pitches)
+    if not chord.strings:
+        return Chord(pitches, None, None, chord.beats)
+    frets = bytearray()
+    new_strings = bytearray()
+    for pitch, string in zip(pitches, chord.strings):
+        if string == NO_POSITION:
+            new_strings.append(NO_POSITION)
+            frets.append(NO_POSITION)
+        elif 0 <= string + string_offset < len(strings) and pitch in strings[string + string_offset]:
+            new_strings.append(string + string_offset)
+            frets.append(pitch - strings[string + string_offset].start)
+        else:
+            break
+    else:
+        return Chord(pitches, new_strings, frets, chord.beats)
+
+    old_frets = [fret for fret in chord.frets if fret not in (0, NO_POSITION)]
+    position = sum(old_frets) / len(old_frets) + shift if old_frets else None
+    # A stretch the old shape already needed is allowed for the new one too
+    max_span = max(4, max(old_frets) - min(old_frets) + 1) if old_frets else 4
+    return place_chord(strings, fret_index, pitches, chord.beats, position, max_span)
+
 
 class Instrument:
+    voice = "string"  # synthesizer voice used when a note has no sound file
+
     def __init__(self):
-        self.note_names = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-        mixer.init()
-        self.sounds = {}
-        self.bind_notes()
-    
-    def __del__(self):
-        # Cleanup pygame mixer when the object is destroyed
-        mixer.quit()
+        self.note_names = NOTE_NAMES
+        # The shared bank indexes and decodes samples on first use, so building an
+        # instrument never touches the sounds directory or the audio device
+        self.sounds = get_sample_bank()
+        self.stats = get_stats()
+        self.voices = get_voice_manager()
     
     def set_notes(self, number, first_note):
-        # medium is that by which notes are played
-        medium = [None] * number 
-        
-        current_note = first_note.copy()
-        medium[0] = current_note.copy()
-        
-        for i in range(1, number):
-            note_idx = self.note_names.index(current_note["note_name"])
-            
-            if note_idx == 11:
-                current_note["note_name"] = "C"
-                current_note["number"] = int(current_note["number"]) + 1
-            else:
-                current_note["note_name"] = self.note_names[note_idx + 1]
-                
-            medium[i] = current_note.copy()
-            
-        return medium
+        # medium is that by which notes are played: consecutive semitones from first_note
+        first_pitch = as_pitch(first_note)
+        return range(first_pitch, first_pitch + number)
     
     def bind_notes(self):
-        sounds_dir = os.path.join(os.path.dirname(__file__), "sounds")
-        if not os.path.exists(sounds_dir):
-            os.makedirs(sounds_dir)
-            print(f"Created sounds directory at {sounds_dir}")
-            print("Please add sound files in format Note+Octave.wav (e.g., C3.wav)")
+        # Samples are decoded lazily by the shared bank; this only indexes the sounds directory
+        self.sounds.scan()
+
+    def note_key(self, note):
+        return PITCH_KEYS[as_pitch(note)]
+
+    def voice_key(self, note):
+        # Notes on the same string choke each other; notes without a string ring on
+        if isinstance(note, Note):
+            return note.string
+        if isinstance(note, dict):
+            return note.get("string")
+        return None
+
+    def prefetch_notes(self, notes, wait=False):
+        # Warm the sample bank in the background for the notes we are about to need,
+        # and synthesize the ones that have no sound file; wait blocks until both are done
+        pitches = list(dict.fromkeys(as_pitch(note) for note in notes))
+        threads = [self.sounds.prefetch(PITCH_KEYS[pitch] for pitch in pitches)]
+        missing = [pitch for pitch in pitches if PITCH_KEYS[pitch] not in self.sounds]
+        if missing:
+            thread = threading.Thread(target=self._prefetch_synth, args=(missing, self.sounds.init_mixer()),
+                                      daemon=True)
+            thread.start()
+            threads.append(thread)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _prefetch_synth(self, pitches, mixer_format):
+        # Build the Sounds themselves at the mixer's format, exactly what play_note will ask for
+        try:
+            from synth import get_synthesizer
+        except ImportError:
             return
-            
-        for file_name in os.listdir(sounds_dir):
-            if file_name.endswith(".wav"):
-                note_part = file_name.split(".")[0]
-                if "+" in note_part:
-                    parts = note_part.split("+")
-                    note_name = parts[0]
-                    number = parts[1]
-                    note_key = f"{note_name}+{number}"
-                    try:
-                        self.sounds[note_key] = Sound(os.path.join(sounds_dir, file_name))
-                    except Exception as e:
-                        print(f"Error loading sound file {file_name}: {str(e)}")
-                
-    def play_note(self, note):
-        file_match = f"{note['note_name']}+{note['number']}"
-        if file_match in self.sounds:
-            self.sounds[file_match].play()
-        else:
-            print(f"No sound file found for {file_match}")
+        synthesizer = get_synthesizer()
+        for pitch in pitches:
+            synthesizer.sound(self.voice, pitch, mixer_format)
+
+    def synth_sound(self, pitch):
+        # Fallback for notes without a sound file; needs NumPy
+        try:
+            from synth import get_synthesizer
+        except ImportError:
+            return None
+        return get_synthesizer().sound(self.voice, pitch, self.sounds.init_mixer())
+
+    def play_note(self, note, clicked=None, found=None):
+        # clicked/found: perf_counter times of a UI click and of its note lookup, so the
+        # stats can time the whole click-to-sound path; nothing is timed while stats are off
+        timing = self.stats.enabled
+        if timing:
+            source = "click" if clicked is not None else "play"
+            if clicked is None:
+                clicked = found = time.perf_counter()
+        pitch = as_pitch(note)
+        sound = self.sounds.get(PITCH_KEYS[pitch])
+        if sound is None:
+            sound = self.synth_sound(pitch)
+        if sound is None:
+            print(f"No sound file found for {PITCH_KEYS[pitch]}")
+            if timing:
+                self.stats.record_missing(source, pitch)
+            return None
+        if not timing:
+            return self.voices.play(sound, self.voice_key(note))
+        loaded = time.perf_counter()
+        channel = self.voices.play(sound, self.voice_key(note))
+        self.stats.record_play(source, pitch, clicked, found, loaded, time.perf_counter())
+        return channel
     
     def stop_all_sounds(self):
-        mixer.stop()
+        self.sounds.stop_all()
+        self.voices.stop_all()
 
 
 class Fretboard(Instrument):
     def __init__(self):
         super().__init__()  
-        self.num_frets = 21  # includes empty fret
-        self.strings = [None] * 6  # 6 strings for guitar
-        self.current_tuning = "standard"
+        self.num_frets = DEFAULT_FRETS  # includes empty fret
+        self.tunings = get_tuning_registry()
+        self.strings = ()  # one range of pitches per string, lowest string first
+        self.current_tuning = DEFAULT_TUNING
+        self.capo = 0
         self.set_tuning(self.current_tuning)
 
-    def set_tuning(self, tuning):
-        tunings = [
-            {
-                "name": "standard",
-                "notes": [
-                    {"note_name": "E", "number": 1},
-                    {"note_name": "A", "number": 1},
-                    {"note_name": "D", "number": 2},
-                    {"note_name": "G", "number": 2},
-                    {"note_name": "B", "number": 2},
-                    {"note_name": "E", "number": 3}
-                ]
-            },
-            {
-                "name": "Atmospheric",
-                "notes": [
-                    {"note_name": "E", "number": 1},
-                    {"note_name": "B", "number": 1},
-                    {"note_name": "E", "number": 2},
-                    {"note_name": "F#", "number": 2},
-                    {"note_name": "B", "number": 2},
-                    {"note_name": "E", "number": 3}
-                ]
-            },
-            {
-                "name": "Drop D",
-                "notes": [
-                    {"note_name": "D", "number": 1},
-                    {"note_name": "A", "number": 1},
-                    {"note_name": "D", "number": 2},
-                    {"note_name": "G", "number": 2},
-                    {"note_name": "B", "number": 2},
-                    {"note_name": "E", "number": 3}
-                ]
-            },
-            {
-                "name": "Open G",
-                "notes": [
-                    {"note_name": "D", "number": 1},
-                    {"note_name": "G", "number": 1},
-                    {"note_name": "D", "number": 2},
-                    {"note_name": "G", "number": 2},
-                    {"note_name": "B", "number": 2},
-                    {"note_name": "D", "number": 3}
-                ]
-            }
-        ]
-    
-        selected_tuning = next((t for t in tunings if t["name"].lower() == tuning.lower()), tunings[0])
-        self.current_tuning = selected_tuning["name"]
+    def set_tuning(self, tuning, capo=None):
+        # The string x fret matrix comes from the registry's cache, so this is a lookup
+        selected_tuning = self.tunings.find(tuning)
+        capo = self.capo if capo is None else capo
+        self.strings, self.fret_index = self.tunings.layout(selected_tuning, capo, self.num_frets)
+        self.current_tuning = selected_tuning.name
+        self.capo = capo
+
+    def set_capo(self, capo):
+        self.set_tuning(self.current_tuning, capo)
+
+    @property
+    def num_strings(self):
+        return len(self.strings)
+
+    @property
+    def fret_count(self):
+        # Playable frets above the capo, counting the open string
+        return self.num_frets - self.capo
 
-        for string_idx, note in enumerate(selected_tuning["notes"]):
-            # Need to use a copy of the note to avoid modifying the original
-            self.strings[string_idx] = self.set_notes(self.num_frets, note.copy())
+    def prefetch_tuning(self):
+        self.prefetch_notes(pitch for string in self.strings for pitch in string)
     
-    def get_note_at_position(self, string_idx, fret):
-        if 0 <= string_idx < len(self.strings) and 0 <= fret < self.num_frets:
+    def get_pitch_at_position(self, string_idx, fret):
+        if 0 <= string_idx < len(self.strings) and 0 <= fret < len(self.strings[string_idx]):
             return self.strings[string_idx][fret]
         return None
+
+    def get_note_at_position(self, string_idx, fret):
+        pitch = self.get_pitch_at_position(string_idx, fret)
+        if pitch is None:
+            return None
+        return Note(pitch, string_idx, fret)
+
+    def find_voicings(self, chord, max_span=4, allow_open=True, allow_muted=True, max_muted=None,
+                      bass=None, limit=None):
+        # chord is a symbol such as "Am7" or "C/E", or an iterable of pitch classes/pitches
+        return find_voicings(self.strings, self.fret_index, chord, max_span=max_span, allow_open=allow_open,
+                             allow_muted=allow_muted, max_muted=max_muted, bass=bass, limit=limit)
               
 
 class Keyboard(Instrument):
+    voice = "piano"
+
     def __init__(self):
         super().__init__()
         self.num_keys = 88
-        self.first_note = {"note_name": "A", "number": 0}  # A0 is the first note on an 88-key piano
+        self.first_note = pitch_of("A", 0)  # A0 is the first note on an 88-key piano
         self.keys = self.set_notes(self.num_keys, self.first_note)
     
+    def voice_key(self, note):
+        # Striking a key again damps the note it was still sounding
+        return ("key", as_pitch(note))
+
     def get_note_at_key(self, key_idx):
         if 0 <= key_idx < self.num_keys:
-            return self.keys[key_idx]
+            return Note(self.keys[key_idx])
         return None
 
 
 class Sheet_Music(Instrument):
     def __init__(self):
         super().__init__()
-        self.song = []  # List of chords, where each chord is a list of notes
+        self._song = PersistentList()  # Chord objects; every edit makes a new version
+        self.history = EditHistory()
+        self.tempo = 60  # beats per minute
         self.song_name = "Untitled"
+        self.tuning = DEFAULT_TUNING  # tuning and capo the song's fret positions refer to
+        self.capo = 0
+        # MIDI note = song pitch - midi_octave_shift: the fretboard numbers octaves one below
+        # concert pitch, keyboard songs do not
+        self.midi_octave_shift = GUITAR_OCTAVE_SHIFT
+        self.tunings = get_tuning_registry()
+        self.sequencer = None
+        self.analysis = SongAnalysis()
     
-    def add_chord(self, chord):
-        if isinstance(chord, list) and all(isinstance(note, dict) for note in chord):
-            self.song.append(chord)
+    @property
+    def voice(self):
+        # Keyboard songs are at concert pitch, so they need the piano voice: the string voice
+        # is raised an octave for the fretboard's numbering
+        return "piano" if self.midi_octave_shift == 0 else "string"
+
+    @property
+    def song(self):
+        # Indexable, iterable and sized like a list, but immutable: edit through the methods below
+        return self._song
+
+    @song.setter
+    def song(self, chords):
+        self._edit("Replace song")
+        self._song = PersistentList(chords)
+
+    @property
+    def durations(self):
+        # Length of each chord in beats
+        return [chord.beats for chord in self._song]
+
+    def _edit(self, label):
+        # Called just before every undoable change, with the state it replaces
+        self.history.record((self._song, self.tuning, self.capo), label)
+
+    def _restore(self, entry):
+        if entry is None:
+            return None
+        (self._song, self.tuning, self.capo), label = entry
+        return label
+
+    def undo(self):
+        # -> label of the undone edit, or None when there was nothing to undo
+        return self._restore(self.history.undo((self._song, self.tuning, self.capo)))
+
+    def redo(self):
+        return self._restore(self.history.redo((self._song, self.tuning, self.capo)))
+
+    def _as_chord(self, chord, beats):
+        if isinstance(chord, Chord):
+            if beats is not None:
+                chord = chord.with_beats(beats)
+        elif isinstance(chord, list) and all(isinstance(note, (dict, Note)) for note in chord):
+            chord = Chord.from_notes(chord, 1 if beats is None else beats)
         else:
-            raise ValueError("Chord must be a list of note dictionaries")
+            raise ValueError("Chord must be a Chord or a list of notes")
+        return chord
+
+    def add_chord(self, chord, beats=None):
+        chord = self._as_chord(chord, beats)
+        self._edit("Add chord")
+        self._song = self._song.append(chord)
+
+    def insert_chord(self, index, chord, beats=None):
+        chord = self._as_chord(chord, beats)
+        self._edit("Insert chord")
+        self._song = self._song.insert(index, chord)
+
+    def replace_chord(self, index, chord, beats=None):
+        if 0 <= index < len(self._song):
+            chord = self._as_chord(chord, beats)
+            self._edit("Replace chord")
+            self._song = self._song.set(index, chord)
     
     def remove_chord(self, index):
-        if 0 <= index < len(self.song):
-            self.song.pop(index)
+        if 0 <= index < len(self._song):
+            self._edit("Remove chord")
+            self._song = self._song.delete(index)
+
+    def move_chord(self, source, destination):
+        if 0 <= source < len(self._song) and source != destination:
+            self._edit("Move chord")
+            self._song = self._song.move(source, destination)
     
     def clear_song(self):
-        self.song = []
+        # Undoable, unlike starting a new song
+        if len(self._song):
+            self._edit("Clear song")
+            self._song = PersistentList()
+
+    def new_song(self, name="Untitled"):
+        self.stop_song()
+        self._song = PersistentList()
+        self.history.clear()
+        self.song_name = name
+        self.midi_octave_shift = GUITAR_OCTAVE_SHIFT
     
     def set_song_name(self, name):
         self.song_name = name
-    
-    def play_song(self):
-        if not self.song:
-            print("No chords in the song to play")
+
+    def transpose(self, semitones, num_frets=DEFAULT_FRETS):
+        song = self._refret(semitones, self.tunings.find(self.tuning), self.capo, num_frets)
+        self._edit(f"Transpose {semitones:+d}")
+        self._song = PersistentList(song)
+
+    def retune(self, tuning=None, capo=None, num_frets=DEFAULT_FRETS):
+        # Keep every pitch but move the song's fret positions to another tuning and/or capo
+        selected_tuning = self.tunings.find(self.tuning) if tuning is None else self.tunings.get(tuning)
+        capo = self.capo if capo is None else capo
+        song = self._refret(0, selected_tuning, capo, num_frets)
+        self._edit("Retune")
+        self._song = PersistentList(song)
+        self.tuning = selected_tuning.name
+        self.capo = capo
+
+    def set_capo(self, capo, num_frets=DEFAULT_FRETS):
+        self.retune(None, capo, num_frets)
+
+    def _refret(self, semitones, tuning, capo, num_frets):
+        # Songs repeat chord objects, so each is converted once, and chords that only differ
+        # in length share one placement search
+        strings, fret_index = self.tunings.layout(tuning, capo, num_frets)
+        shift = semitones + self.capo - capo
+        # Strings are numbered from the lowest, so line the highest strings up: a 6-string
+        # shape moves onto the top six strings of a 7- or 8-string tuning
+        string_offset = len(strings) - self.tunings.find(self.tuning).num_strings
+        converted = {}  # id(chord) -> new chord; the song keeps every chord alive meanwhile
+        shapes = {}
+        song = []
+        for chord in self._song:
+            new_chord = converted.get(id(chord))
+            if new_chord is None:
+                shape = (chord.pitches, chord.strings, chord.frets)
+                placed = shapes.get(shape)
+                if placed is None:
+                    placed = refret_chord(chord, semitones, strings, fret_index, shift, string_offset)
+                    shapes[shape] = placed
+                if placed.beats != chord.beats:
+                    placed = placed.with_beats(chord.beats)
+                new_chord = converted[id(chord)] = placed
+            song.append(new_chord)
+        return song
+
+    def save_song(self, path):
+        # .json files are written as a readable export, .mid/.midi as a MIDI file at concert
+        # pitch (undoing the octave shift the song was imported with), anything else in the
+        # binary format
+        if path.lower().endswith(".json"):
+            export_json(path, self.song, self.song_name, self.tuning, self.tempo, self.capo, self.midi_octave_shift)
+        elif path.lower().endswith(MIDI_EXTENSIONS):
+            export_midi(path, self.song, self.song_name, self.tempo, octave_shift=-self.midi_octave_shift)
+        else:
+            save_song(path, self.song, self.song_name, self.tuning, self.tempo, self.capo, self.midi_octave_shift)
+
+    def load_song(self, path):
+        if path.lower().endswith(MIDI_EXTENSIONS):
+            self.import_midi(path)
             return
-            
-        try:
-            for chord in self.song:
-                # Play all notes in the chord simultaneously
-                for note in chord:
-                    self.play_note(note)
-                time.sleep(1)  # Wait 1 second between chords
-        except KeyboardInterrupt:
-            print("\nPlayback interrupted by user")
-            self.stop_all_sounds()
-        except Exception as e:
-            print(f"Error during playback: {str(e)}")
-            self.stop_all_sounds()
+        if path.lower().endswith(".json"):
+            name, tuning, tempo, chords, capo, octave_shift = import_json(path)
+        else:
+            name, tuning, tempo, chords, capo, octave_shift = load_song(path)
+        self.stop_song()
+        self._song = PersistentList(chords)
+        self.history.clear()
+        self.song_name = name
+        self.tuning = tuning
+        self.capo = capo
+        self.midi_octave_shift = octave_shift
+        self.set_tempo(tempo)
+
+    def import_midi(self, path, tuning=None, capo=None, keyboard=False, octave_shift=None, **options):
+        # Read a MIDI file as this song: chords placed on the fretboard in `tuning`/`capo`
+        # (the song's current ones by default), or left unplaced as keyboard keys.
+        # octave_shift defaults to the fretboard's octave numbering, or 0 for the keyboard.
+        if keyboard:
+            keys = Keyboard().keys
+            if octave_shift is None:
+                octave_shift = 0
+            name, tempo, chords = import_midi(path, keys=keys, octave_shift=octave_shift, **options)
+        else:
+            selected_tuning = self.tunings.find(self.tuning) if tuning is None else self.tunings.get(tuning)
+            capo = self.capo if capo is None else capo
+            strings, fret_index = self.tunings.layout(selected_tuning, capo)
+            if octave_shift is None:
+                octave_shift = GUITAR_OCTAVE_SHIFT
+            name, tempo, chords = import_midi(path, strings, fret_index, octave_shift=octave_shift, **options)
+            self.tuning = selected_tuning.name
+            self.capo = capo
+        self.stop_song()
+        self._song = PersistentList(chords)
+        self.history.clear()
+        self.song_name = name
+        self.midi_octave_shift = octave_shift
+        self.set_tempo(tempo)
 
+    def analyse(self):
+        # Brings the harmonic analysis up to date, re-analysing only changed chords
+        return self.analysis.update(self.song)
 
+    def set_tempo(self, tempo):
+        if tempo <= 0:
+            raise ValueError("Tempo must be positive")
+        self.tempo = tempo
+        if self.sequencer is not None:
+            self.sequencer.set_tempo(tempo)
+    
+    def get_sequencer(self):
+        if self.sequencer is None:
+            self.sequencer = Sequencer(self)
+        return self.sequencer
 
+    def play_song(self, blocking=False):
+        # Playback runs on the sequencer thread; blocking waits for it from the caller
+        if not self.song:
+            print("No chords in the song to play")
+            return None
 
-                
+        sequencer = self.get_sequencer()
+        sequencer.stop()
+        sequencer.load_song(self)
+        sequencer.start()
+        if not blocking:
+            return sequencer
 
+        try:
+            while sequencer.playing:
+                time.sleep(0.05)
+        except KeyboardInterrupt:
+            print("\nPlayback interrupted by user")
+            self.stop_song()
+        return sequencer
 
+    def prefetch_song(self):
+        # Every pitch is decoded or synthesized before the first chord: doing it at a note's
+        # onset would delay that chord and everything queued behind it
+        chord_pitches = dict.fromkeys(chord.pitches for chord in self._song)
+        self.prefetch_notes(dict.fromkeys(pitch for pitches in chord_pitches for pitch in pitches), wait=True)
 
+    def pause_song(self):
+        if self.sequencer is not None:
+            self.sequencer.pause()
 
+    def resume_song(self):
+        if self.sequencer is not None:
+            self.sequencer.start()
 
+    def seek_song(self, chord_index):
+        if self.sequencer is not None:
+            self.sequencer.seek_chord(chord_index)
 
-            
\ No newline at end of file
+    def stop_song(self):
+        if self.sequencer is not None:
+            self.sequencer.stop()
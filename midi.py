@@ -0,0 +1,295 @@
+import heapq
+import mmap
+import os
+import struct
+import threading
+from pitch import NUM_PITCHES, Chord
+from voicings import place_chord
+
+MIDI_EXTENSIONS = (".mid", ".midi")
+# The fretboard numbers octaves one below concert pitch (its E1 is a guitar's low E, MIDI
+# note 40), so guitar songs move down an octave on import and back up on export
+GUITAR_OCTAVE_SHIFT = -12
+DRUM_CHANNEL = 9
+DEFAULT_TEMPO = 120.0  # MIDI's tempo when a file sets none
+TICKS_PER_BEAT = 480
+
+# Event kinds, ordered so that at the same tick tempo changes come first
+TEMPO, NAME, NOTES = range(3)
+
+CHUNK = struct.Struct(">4sI")
+HEADER = struct.Struct(">HHH")
+
+
+def _read_varlen(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos
+
+
+def _track_events(data, start, end, track, note_ends, skip_channel=None, note_range=range(128)):
+    # Yield (tick, kind, track, value) for the events we use, decoding lazily as the merge
+    # asks for them; everything else is skipped over without building objects.
+    #   notes  value is a tuple of the note numbers switched on at that tick in this track
+    #   tempo  value is microseconds per beat
+    #   name   value is the text
+    # Note-offs are not yielded, only the tick of the track's last one is kept in note_ends.
+    # Note-ons on skip_channel or outside note_range are dropped.
+    pos = start
+    tick = 0
+    status = kind = 0
+    skipped = False  # the running status is a note on the skipped channel
+    notes = []
+    notes_tick = 0
+    last_off = 0
+    while pos < end:
+        delta = data[pos]
+        pos += 1
+        if delta:
+            if delta >= 0x80:
+                delta, pos = _read_varlen(data, pos - 1)
+            tick += delta
+            if notes:
+                yield (notes_tick, NOTES, track, tuple(notes))
+                notes = []
+        byte = data[pos]
+        if byte >= 0x80:
+            status = byte
+            kind = status & 0xF0
+            skipped = status & 0x0F == skip_channel
+            pos += 1
+        elif not status:
+            raise ValueError("MIDI event without a status byte")
+        if kind <= 0x90:  # note on or off, by far the most common events
+            note = data[pos]
+            if kind == 0x80 or not data[pos + 1]:
+                if tick > last_off:
+                    last_off = tick
+            elif not skipped and note in note_range:
+                if not notes:
+                    notes_tick = tick
+                notes.append(note)
+            pos += 2
+        elif kind == 0xC0 or kind == 0xD0:
+            pos += 1
+        elif kind < 0xF0:
+            pos += 2
+        elif status == 0xFF:
+            meta = data[pos]
+            length, pos = _read_varlen(data, pos + 1)
+            if meta == 0x51 and length == 3:
+                yield (tick, TEMPO, track, int.from_bytes(data[pos:pos + 3], "big"))
+            elif meta == 0x03:
+                yield (tick, NAME, track, bytes(data[pos:pos + length]).decode("latin-1"))
+            elif meta == 0x2F:
+                break
+            pos += length
+            status = kind = 0  # meta and sysex events cancel running status
+        elif status == 0xF0 or status == 0xF7:
+            length, pos = _read_varlen(data, pos)
+            pos += length
+            status = kind = 0
+        else:
+            raise ValueError(f"Unsupported MIDI status byte {status:#x}")
+    if notes:
+        yield (notes_tick, NOTES, track, tuple(notes))
+    note_ends[track] = last_off
+
+
+class MidiFile:
+    # Memory-mapped MIDI file: only the chunk headers are read up front, the events of all
+    # tracks are streamed and merged in time order on demand
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is not a MIDI file")
+        try:
+            self._read_header()
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise ValueError(f"{path} is not a MIDI file: {str(e)}")
+        self.note_ends = {}  # track -> tick of its last note-off, filled in as tracks finish
+
+    def _read_header(self):
+        magic, length = CHUNK.unpack_from(self.map, 0)
+        if magic != b"MThd" or length < HEADER.size:
+            raise ValueError("missing MThd header")
+        self.format, track_count, division = HEADER.unpack_from(self.map, CHUNK.size)
+        if division & 0x8000:
+            raise ValueError("SMPTE time division is not supported")
+        self.ticks_per_beat = division
+        self.tracks = []  # (start, end) of each track's event data
+        pos = CHUNK.size + length
+        while pos + CHUNK.size <= len(self.map) and len(self.tracks) < track_count:
+            magic, length = CHUNK.unpack_from(self.map, pos)
+            pos += CHUNK.size
+            if magic == b"MTrk":
+                self.tracks.append((pos, min(pos + length, len(self.map))))
+            pos += length
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def events(self, skip_channel=None, note_range=range(128)):
+        # All tracks merged by tick; memory is one pending event per track. A single track
+        # (format 0) is already in order and skips the merge.
+        tracks = [_track_events(self.map, start, end, track, self.note_ends, skip_channel, note_range)
+                  for track, (start, end) in enumerate(self.tracks)]
+        events = tracks[0] if len(tracks) == 1 else heapq.merge(*tracks)
+        try:
+            yield from events
+        except IndexError:
+            raise ValueError(f"{self.path} is truncated")
+
+    def chords(self, octave_shift=0, tolerance=None, grid=0.125, skip_drums=True):
+        # Yield (pitches, beats): note-ons starting within `tolerance` ticks of each other form
+        # a chord, which lasts until the next chord starts (rests join the chord before them).
+        # Durations are rounded to `grid` beats. Sets self.tempo (the first tempo; the song
+        # model has a single tempo) and self.name as they appear.
+        if tolerance is None:
+            tolerance = max(1, self.ticks_per_beat // 32)
+        self.tempo = None
+        self.name = None
+        ticks_per_beat = self.ticks_per_beat
+        start = None
+        notes = None  # of the chord being collected: the first event's tuple, a set once others join
+        chord_pitches = {}  # notes -> sorted, shifted pitches; songs repeat their chords
+        lengths = {}  # ticks -> beats
+
+        def pitches(notes):
+            key = notes if isinstance(notes, tuple) else tuple(sorted(notes))
+            result = chord_pitches.get(key)
+            if result is None:
+                result = chord_pitches[key] = tuple(sorted({note + octave_shift for note in key}))
+            return result
+
+        def beats(ticks):
+            result = lengths.get(ticks)
+            if result is None:
+                result = lengths[ticks] = max(grid, round(ticks / ticks_per_beat / grid) * grid)
+            return result
+
+        note_range = range(max(0, -octave_shift), min(128, NUM_PITCHES - octave_shift))
+        events = self.events(DRUM_CHANNEL if skip_drums else None, note_range)
+        for tick, kind, track, value in events:
+            if kind == NOTES:
+                if start is None:
+                    start = tick
+                    notes = value
+                elif tick - start > tolerance:
+                    yield pitches(notes), beats(tick - start)
+                    start = tick
+                    notes = value
+                elif isinstance(notes, tuple):
+                    notes = set(notes)
+                    notes.update(value)
+                else:
+                    notes.update(value)
+            elif kind == TEMPO:
+                if self.tempo is None and value:
+                    self.tempo = 60000000.0 / value
+            elif self.name is None and value.strip():
+                self.name = value.strip()
+        if start is not None:
+            end = max(self.note_ends.values(), default=0)
+            yield pitches(notes), beats(max(end - start, 1))
+
+
+def fretboard_chords(chords, strings, fret_index):
+    # (pitches, beats) -> placed Chords with exactly the file's pitches; chords that do not fit
+    # on the fretboard stay unplaced. Each distinct set of pitches is placed once, and since
+    # Chords are immutable, repeats of the same chord and length share one object.
+    shapes = {}
+    placed = {}
+    for pitches, beats in chords:
+        chord = placed.get((pitches, beats))
+        if chord is None:
+            shape = shapes.get(pitches)
+            if shape is None:
+                shape = shapes[pitches] = place_chord(strings, fret_index, pitches, exact=True)
+            chord = placed[pitches, beats] = shape if shape.beats == beats else shape.with_beats(beats)
+        yield chord
+
+
+def keyboard_chords(chords, keys):
+    # (pitches, beats) -> unplaced Chords, with notes beyond the keyboard folded in by octaves
+    folded_chords = {}
+    for pitches, beats in chords:
+        chord = folded_chords.get((pitches, beats))
+        if chord is None:
+            folded = set()
+            for pitch in pitches:
+                while pitch < keys.start:
+                    pitch += 12
+                while pitch >= keys.stop:
+                    pitch -= 12
+                folded.add(pitch)
+            chord = folded_chords[pitches, beats] = Chord(sorted(folded), None, None, beats)
+        yield chord
+
+
+def import_midi(path, strings=None, fret_index=None, keys=None, octave_shift=GUITAR_OCTAVE_SHIFT, **options):
+    # -> (name, tempo, list of Chords) placed on a fretboard layout, or on keyboard keys
+    with MidiFile(path) as midi_file:
+        chords = midi_file.chords(octave_shift, **options)
+        if keys is not None:
+            song = list(keyboard_chords(chords, keys))
+        else:
+            song = list(fretboard_chords(chords, strings, fret_index))
+        name = midi_file.name or os.path.splitext(os.path.basename(path))[0]
+        return name, midi_file.tempo or DEFAULT_TEMPO, song
+
+
+def _varlen(value):
+    data = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        data.insert(0, 0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(data)
+
+
+def export_midi(path, chords, name="Untitled", tempo=60, octave_shift=-GUITAR_OCTAVE_SHIFT,
+                ticks_per_beat=TICKS_PER_BEAT, velocity=80):
+    # Write a format 0 file: the song name, its tempo, then each chord's notes held for its length
+    track = bytearray()
+    name_bytes = name.encode("latin-1", "replace")
+    track += b"\x00\xff\x03" + _varlen(len(name_bytes)) + name_bytes
+    track += b"\x00\xff\x51\x03" + int(round(60000000 / tempo)).to_bytes(3, "big")
+    delay = 0  # ticks since the last event written
+    for chord in chords:
+        pitches = [pitch + octave_shift for pitch in chord.pitches]
+        if any(not 0 <= pitch < NUM_PITCHES for pitch in pitches):
+            raise ValueError(f"Chord {chord.label()} is outside the MIDI note range after shifting")
+        length = max(1, int(round(chord.beats * ticks_per_beat)))
+        if not pitches:
+            delay += length
+            continue
+        for pitch in pitches:
+            track += _varlen(delay) + bytes((0x90, pitch, velocity))
+            delay = 0
+        for index, pitch in enumerate(pitches):
+            track += _varlen(length if index == 0 else 0) + bytes((0x80, pitch, 0))
+    track += _varlen(delay) + b"\xff\x2f\x00"
+
+    data = (CHUNK.pack(b"MThd", HEADER.size) + HEADER.pack(0, 1, ticks_per_beat)
+            + CHUNK.pack(b"MTrk", len(track)) + bytes(track))
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as midi_file:
+        midi_file.write(data)
+    os.replace(temp_path, path)
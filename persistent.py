@@ -0,0 +1,197 @@
+# An immutable list backed by an AVL tree ordered by position. Every edit returns a new
+# list in O(log n) that shares all untouched nodes with the old one, so keeping every
+# version of a song (for undo) costs memory proportional to the edits, not the song.
+# Each node holds a small tuple of items rather than one, so building a list from a whole
+# song creates a few thousand nodes instead of one per chord.
+
+CHUNK_SIZE = 32  # items per node in a bulk build; an edit splits chunks that outgrow twice this
+
+
+class _Node:
+    __slots__ = ("left", "items", "right", "size", "height")
+
+    def __init__(self, left, items, right):
+        self.left = left
+        self.items = items
+        self.right = right
+        left_size, left_height = (left.size, left.height) if left is not None else (0, 0)
+        right_size, right_height = (right.size, right.height) if right is not None else (0, 0)
+        self.size = left_size + right_size + len(items)
+        self.height = (left_height if left_height > right_height else right_height) + 1
+
+
+def _height(node):
+    return node.height if node is not None else 0
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _balance(left, items, right):
+    # Build a node whose subtrees differ in height by at most two, rotating it back into shape
+    left_height, right_height = _height(left), _height(right)
+    if left_height > right_height + 1:
+        if _height(left.left) >= _height(left.right):
+            return _Node(left.left, left.items, _Node(left.right, items, right))
+        pivot = left.right
+        return _Node(_Node(left.left, left.items, pivot.left), pivot.items, _Node(pivot.right, items, right))
+    if right_height > left_height + 1:
+        if _height(right.right) >= _height(right.left):
+            return _Node(_Node(left, items, right.left), right.items, right.right)
+        pivot = right.left
+        return _Node(_Node(left, items, pivot.left), pivot.items, _Node(pivot.right, right.items, right.right))
+    return _Node(left, items, right)
+
+
+def _build(chunks, start, stop):
+    if start >= stop:
+        return None
+    middle = (start + stop) // 2
+    return _Node(_build(chunks, start, middle), chunks[middle], _build(chunks, middle + 1, stop))
+
+
+def _get(node, index):
+    while True:
+        left_size = _size(node.left)
+        if index < left_size:
+            node = node.left
+            continue
+        index -= left_size
+        if index < len(node.items):
+            return node.items[index]
+        index -= len(node.items)
+        node = node.right
+
+
+def _prepend(node, items):
+    # Add a chunk in front of everything in this subtree
+    if node is None:
+        return _Node(None, items, None)
+    return _balance(_prepend(node.left, items), node.items, node.right)
+
+
+def _insert(node, index, value):
+    if node is None:
+        return _Node(None, (value,), None)
+    left_size = _size(node.left)
+    if index < left_size:
+        return _balance(_insert(node.left, index, value), node.items, node.right)
+    offset = index - left_size
+    if offset > len(node.items):
+        return _balance(node.left, node.items, _insert(node.right, offset - len(node.items), value))
+    items = node.items[:offset] + (value,) + node.items[offset:]
+    if len(items) <= 2 * CHUNK_SIZE:
+        return _Node(node.left, items, node.right)
+    # Split an overgrown chunk: its second half goes first in the right subtree
+    half = len(items) // 2
+    return _balance(node.left, items[:half], _prepend(node.right, items[half:]))
+
+
+def _pop_first(node):
+    # -> (first chunk, node without it)
+    if node.left is None:
+        return node.items, node.right
+    items, left = _pop_first(node.left)
+    return items, _balance(left, node.items, node.right)
+
+
+def _delete(node, index):
+    left_size = _size(node.left)
+    if index < left_size:
+        return _balance(_delete(node.left, index), node.items, node.right)
+    offset = index - left_size
+    if offset >= len(node.items):
+        return _balance(node.left, node.items, _delete(node.right, offset - len(node.items)))
+    if len(node.items) > 1:
+        return _Node(node.left, node.items[:offset] + node.items[offset + 1:], node.right)
+    if node.left is None:
+        return node.right
+    if node.right is None:
+        return node.left
+    items, right = _pop_first(node.right)
+    return _balance(node.left, items, right)
+
+
+def _set(node, index, value):
+    left_size = _size(node.left)
+    if index < left_size:
+        return _Node(_set(node.left, index, value), node.items, node.right)
+    offset = index - left_size
+    if offset >= len(node.items):
+        return _Node(node.left, node.items, _set(node.right, offset - len(node.items), value))
+    return _Node(node.left, node.items[:offset] + (value,) + node.items[offset + 1:], node.right)
+
+
+class PersistentList:
+    __slots__ = ("root",)
+
+    def __init__(self, items=()):
+        if isinstance(items, PersistentList):
+            self.root = items.root
+        else:
+            items = tuple(items)
+            chunks = [items[start:start + CHUNK_SIZE] for start in range(0, len(items), CHUNK_SIZE)]
+            self.root = _build(chunks, 0, len(chunks))
+
+    @classmethod
+    def _from_root(cls, root):
+        new = cls.__new__(cls)
+        new.root = root
+        return new
+
+    def __len__(self):
+        return _size(self.root)
+
+    def _index(self, index):
+        size = _size(self.root)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("list index out of range")
+        return index
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return _get(self.root, self._index(index))
+
+    def __iter__(self):
+        # In-order walk with an explicit stack
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield from node.items
+            node = node.right
+
+    def __repr__(self):
+        return f"PersistentList({list(self)!r})"
+
+    # Edits return a new list and leave this one untouched
+
+    def insert(self, index, value):
+        size = _size(self.root)
+        if index < 0:
+            index = max(0, index + size)
+        return PersistentList._from_root(_insert(self.root, min(index, size), value))
+
+    def append(self, value):
+        return PersistentList._from_root(_insert(self.root, _size(self.root), value))
+
+    def delete(self, index):
+        return PersistentList._from_root(_delete(self.root, self._index(index)))
+
+    def set(self, index, value):
+        return PersistentList._from_root(_set(self.root, self._index(index), value))
+
+    def move(self, source, destination):
+        # Take the item at source out and put it back so that it ends up at destination
+        source = self._index(source)
+        value = _get(self.root, source)
+        root = _delete(self.root, source)
+        destination = min(max(destination, 0), _size(root))
+        return PersistentList._from_root(_insert(root, destination, value))
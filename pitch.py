@@ -0,0 +1,222 @@
+import re
+
+NOTE_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+FLAT_NAMES = {"Db": 1, "Eb": 3, "Gb": 6, "Ab": 8, "Bb": 10, "Cb": 11, "Fb": 4, "E#": 5, "B#": 0}
+PITCH_CLASSES = {name: index for index, name in enumerate(NOTE_NAMES)}
+PITCH_CLASSES.update(FLAT_NAMES)
+
+# Pitches are MIDI-style integers: 12 * (octave + 1) + pitch class, so C-1 is 0 and the
+# "E" / number 1 note of the standard tuning is 28. Everything below is a table lookup.
+NUM_PITCHES = 128
+NO_POSITION = 255  # string/fret byte for a note that is not placed on the fretboard
+PITCH_NAMES = tuple(NOTE_NAMES[pitch % 12] for pitch in range(NUM_PITCHES))
+PITCH_OCTAVES = tuple(pitch // 12 - 1 for pitch in range(NUM_PITCHES))
+PITCH_LABELS = tuple(f"{PITCH_NAMES[pitch]}{PITCH_OCTAVES[pitch]}" for pitch in range(NUM_PITCHES))
+PITCH_KEYS = tuple(f"{PITCH_NAMES[pitch]}+{PITCH_OCTAVES[pitch]}" for pitch in range(NUM_PITCHES))  # sound file names
+
+
+def pitch_of(note_name, number):
+    pitch = 12 * (int(number) + 1) + PITCH_CLASSES[note_name]
+    if not 0 <= pitch < NUM_PITCHES:
+        raise ValueError(f"Note {note_name}{number} is outside the supported pitch range")
+    return pitch
+
+
+def parse_pitch(label):
+    # "F#2" / "Bb0" -> pitch
+    match = re.fullmatch(r"\s*([A-Ga-g][#b]?)(-?\d+)\s*", label)
+    if match is None:
+        raise ValueError(f"Cannot read {label!r} as a note such as E1 or F#2")
+    name = match.group(1)
+    return pitch_of(name[0].upper() + name[1:], match.group(2))
+
+
+def as_pitch(note):
+    # Accept an int pitch, a Note or a legacy {"note_name": ..., "number": ...} dict
+    if isinstance(note, int):
+        return note
+    if isinstance(note, Note):
+        return note.pitch
+    if isinstance(note, dict):
+        return pitch_of(note["note_name"], note["number"])
+    raise ValueError(f"Cannot interpret {note!r} as a note")
+
+
+def note_dict(pitch, string=None, fret=None):
+    note = {"note_name": PITCH_NAMES[pitch], "number": PITCH_OCTAVES[pitch]}
+    if string is not None:
+        note["string"] = string
+        note["fret"] = fret
+    return note
+
+
+class Note:
+    __slots__ = ("pitch", "string", "fret")
+
+    def __init__(self, pitch, string=None, fret=None):
+        self.pitch = pitch
+        self.string = string
+        self.fret = fret
+
+    @classmethod
+    def from_dict(cls, note):
+        return cls(as_pitch(note), note.get("string"), note.get("fret"))
+
+    @property
+    def note_name(self):
+        return PITCH_NAMES[self.pitch]
+
+    @property
+    def number(self):
+        return PITCH_OCTAVES[self.pitch]
+
+    @property
+    def label(self):
+        return PITCH_LABELS[self.pitch]
+
+    def to_dict(self):
+        return note_dict(self.pitch, self.string, self.fret)
+
+    def __eq__(self, other):
+        if not isinstance(other, Note):
+            return NotImplemented
+        return (self.pitch, self.string, self.fret) == (other.pitch, other.string, other.fret)
+
+    def __hash__(self):
+        return hash((self.pitch, self.string, self.fret))
+
+    def __repr__(self):
+        if self.string is None:
+            return f"Note({self.label})"
+        return f"Note({self.label}, string={self.string}, fret={self.fret})"
+
+
+_UNPLACED = b""
+
+
+class Chord:
+    # Pitches, strings and frets are packed into bytes: one byte per note instead of a dict.
+    # Chords are never modified after construction, so songs and edit histories share them freely.
+    __slots__ = ("pitches", "strings", "frets", "beats")
+
+    def __init__(self, pitches, strings=None, frets=None, beats=1.0):
+        pitches = bytes(pitches)
+        if strings is None or not any(s != NO_POSITION for s in strings):
+            strings = frets = _UNPLACED
+        else:
+            strings = bytes(strings)
+            frets = bytes(frets)
+            if not len(strings) == len(frets) == len(pitches):
+                raise ValueError("Chord strings and frets must match its pitches")
+        if beats <= 0:
+            raise ValueError("Chord duration must be positive")
+        self.pitches = pitches
+        self.strings = strings
+        self.frets = frets
+        self.beats = float(beats)
+
+    @classmethod
+    def from_notes(cls, notes, beats=1.0):
+        pitches = bytearray()
+        strings = bytearray()
+        frets = bytearray()
+        for note in notes:
+            if isinstance(note, dict):
+                note = Note.from_dict(note)
+            elif not isinstance(note, Note):
+                note = Note(as_pitch(note))
+            pitches.append(note.pitch)
+            strings.append(NO_POSITION if note.string is None else note.string)
+            frets.append(NO_POSITION if note.fret is None else note.fret)
+        return cls(pitches, strings, frets, beats)
+
+    @property
+    def placed(self):
+        return bool(self.strings)
+
+    def notes(self):
+        if not self.strings:
+            return [Note(pitch) for pitch in self.pitches]
+        return [Note(pitch, None if string == NO_POSITION else string, None if fret == NO_POSITION else fret)
+                for pitch, string, fret in zip(self.pitches, self.strings, self.frets)]
+
+    def with_beats(self, beats):
+        return Chord(self.pitches, self.strings or None, self.frets or None, beats)
+
+    def label(self):
+        return " ".join(PITCH_LABELS[pitch] for pitch in self.pitches)
+
+    def __len__(self):
+        return len(self.pitches)
+
+    def __iter__(self):
+        return iter(self.notes())
+
+    def __eq__(self, other):
+        if not isinstance(other, Chord):
+            return NotImplemented
+        return (self.pitches == other.pitches and self.strings == other.strings
+                and self.frets == other.frets and self.beats == other.beats)
+
+    def __hash__(self):
+        return hash((self.pitches, self.strings, self.frets, self.beats))
+
+    def __repr__(self):
+        return f"Chord({self.label()}, beats={self.beats:g})"
+
+
+# Chord symbols: suffix -> intervals above the root
+CHORD_FORMULAS = {
+    "": (0, 4, 7),
+    "m": (0, 3, 7),
+    "dim": (0, 3, 6),
+    "aug": (0, 4, 8),
+    "sus2": (0, 2, 7),
+    "sus4": (0, 5, 7),
+    "5": (0, 7),
+    "6": (0, 4, 7, 9),
+    "m6": (0, 3, 7, 9),
+    "7": (0, 4, 7, 10),
+    "maj7": (0, 4, 7, 11),
+    "m7": (0, 3, 7, 10),
+    "mmaj7": (0, 3, 7, 11),
+    "dim7": (0, 3, 6, 9),
+    "m7b5": (0, 3, 6, 10),
+    "aug7": (0, 4, 8, 10),
+    "7sus4": (0, 5, 7, 10),
+    "add9": (0, 2, 4, 7),
+    "madd9": (0, 2, 3, 7),
+    "9": (0, 2, 4, 7, 10),
+    "maj9": (0, 2, 4, 7, 11),
+    "m9": (0, 2, 3, 7, 10),
+    "7b9": (0, 1, 4, 7, 10),
+    "7#9": (0, 3, 4, 7, 10),
+    "11": (0, 2, 4, 5, 7, 10),
+    "13": (0, 2, 4, 7, 9, 10),
+}
+CHORD_ALIASES = {
+    "M": "", "maj": "", "min": "m", "-": "m", "mi": "m", "o": "dim", "°": "dim", "+": "aug",
+    "sus": "sus4", "M7": "maj7", "Maj7": "maj7", "Δ": "maj7", "Δ7": "maj7", "-7": "m7", "min7": "m7",
+    "o7": "dim7", "°7": "dim7", "ø": "m7b5", "ø7": "m7b5", "+7": "aug7", "mM7": "mmaj7", "mMaj7": "mmaj7",
+    "M9": "maj9", "-9": "m9", "min9": "m9",
+}
+_CHORD_SYMBOL = re.compile(r"^\s*([A-G][#b]?)([^/]*?)(?:/([A-G][#b]?))?\s*$")
+
+
+def parse_chord_symbol(symbol):
+    # "Am7/G" -> (root pitch class, intervals, bass pitch class or None)
+    match = _CHORD_SYMBOL.match(symbol)
+    if not match:
+        raise ValueError(f"Unrecognised chord symbol {symbol!r}")
+    root, suffix, bass = match.groups()
+    suffix = CHORD_ALIASES.get(suffix, suffix)
+    if suffix not in CHORD_FORMULAS:
+        suffix = CHORD_ALIASES.get(suffix.lower(), suffix.lower())
+    if suffix not in CHORD_FORMULAS:
+        raise ValueError(f"Unknown chord quality {match.group(2)!r} in {symbol!r}")
+    return PITCH_CLASSES[root], CHORD_FORMULAS[suffix], None if bass is None else PITCH_CLASSES[bass]
+
+
+def chord_pitch_classes(symbol):
+    root, intervals, _ = parse_chord_symbol(symbol)
+    return frozenset((root + interval) % 12 for interval in intervals)
@@ -0,0 +1,118 @@
+import os
+import wave
+import numpy as np
+from sample_bank import SOUNDS_DIR
+from pitch import PITCH_KEYS
+from synth import get_synthesizer
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+
+def read_wav(path, sample_rate=SAMPLE_RATE):
+    # Decode a wav file into float32 frames of shape (n, CHANNELS) at sample_rate
+    with wave.open(path, "rb") as wav_file:
+        width = wav_file.getsampwidth()
+        channels = wav_file.getnchannels()
+        rate = wav_file.getframerate()
+        raw = wav_file.readframes(wav_file.getnframes())
+
+    if width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        data = (packed[:, 0] | (packed[:, 1] << 8) | (packed[:, 2] << 16)) << 8 >> 8
+        data = data.astype(np.float32) / 8388608.0
+    elif width == 4:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {path}")
+
+    data = data.reshape(-1, channels)
+    if channels == 1:
+        data = np.repeat(data, CHANNELS, axis=1)
+    else:
+        data = data[:, :CHANNELS]
+
+    if rate != sample_rate and len(data):
+        frames = int(round(len(data) * sample_rate / rate))
+        positions = np.linspace(0, len(data) - 1, frames)
+        data = np.stack([np.interp(positions, np.arange(len(data)), data[:, c]) for c in range(CHANNELS)], axis=1)
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+def write_wav(path, frames, sample_rate=SAMPLE_RATE):
+    pcm = (np.clip(frames, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(frames.shape[1])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+
+class SongRenderer:
+    def __init__(self, sounds_dir=SOUNDS_DIR, sample_rate=SAMPLE_RATE, gain=1.0, ceiling=0.98, voice="string"):
+        self.sounds_dir = sounds_dir
+        self.voice = voice  # synthesizer voice for pitches without a sound file
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.ceiling = ceiling  # peak level the mix is scaled down to if it would clip
+        self.samples = {}  # (voice, pitch) -> decoded frames
+
+    def sample(self, pitch, voice=None):
+        voice = voice or self.voice
+        key = (voice, pitch)
+        if key not in self.samples:
+            path = os.path.join(self.sounds_dir, f"{PITCH_KEYS[pitch]}.wav")
+            if os.path.exists(path):
+                try:
+                    self.samples[key] = read_wav(path, self.sample_rate)
+                    return self.samples[key]
+                except (OSError, EOFError, wave.Error, ValueError) as e:
+                    print(f"No usable sound file for {PITCH_KEYS[pitch]}: {str(e)}")
+            mono = get_synthesizer().wave(voice, pitch, self.sample_rate)
+            self.samples[key] = np.repeat(mono[:, None], CHANNELS, axis=1)
+        return self.samples[key]
+
+    def render(self, chords, tempo, voice=None):
+        # Mix every chord into one float32 buffer of shape (frames, CHANNELS); voice overrides
+        # the renderer's synthesizer voice for this song
+        if not chords:
+            return np.zeros((0, CHANNELS), dtype=np.float32)
+
+        durations = np.fromiter((chord.beats for chord in chords), dtype=np.float64, count=len(chords))
+        beats = np.concatenate(([0.0], np.cumsum(durations)[:-1]))
+        offsets = np.rint(beats * 60.0 / tempo * self.sample_rate).astype(np.int64)
+
+        # Group onsets by note so each sample is looked up once
+        hits = {}
+        for offset, chord in zip(offsets.tolist(), chords):
+            for pitch in chord.pitches:
+                hits.setdefault(pitch, []).append(offset)
+
+        length = int(offsets[-1]) + 1
+        for pitch, note_offsets in hits.items():
+            length = max(length, note_offsets[-1] + len(self.sample(pitch, voice)))
+
+        mix = np.zeros((length, CHANNELS), dtype=np.float32)
+        for pitch, note_offsets in hits.items():
+            data = self.sample(pitch, voice)
+            size = len(data)
+            for offset in note_offsets:
+                mix[offset:offset + size] += data
+
+        # Leave headroom for the densest chord, then scale down if the mix still peaks too high
+        polyphony = max(len(chord) for chord in chords)
+        mix *= self.gain / np.sqrt(max(polyphony, 1))
+        peak = float(np.abs(mix).max()) if len(mix) else 0.0
+        if peak > self.ceiling:
+            mix *= self.ceiling / peak
+        return mix
+
+    def render_song(self, sheet_music, path):
+        # Keyboard songs sound at concert pitch, so the song picks the voice
+        mix = self.render(sheet_music.song, sheet_music.tempo, sheet_music.voice)
+        write_wav(path, mix, self.sample_rate)
+        return path
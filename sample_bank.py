@@ -0,0 +1,209 @@
+import os
+import mmap
+import sys
+import threading
+from collections import OrderedDict
+
+SOUNDS_DIR = os.path.join(os.path.dirname(__file__), "sounds")
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # bytes of decoded PCM kept in memory
+
+
+def get_mixer():
+    # pygame is only imported once something actually needs to make sound
+    from pygame import mixer
+    return mixer
+
+
+def mixer_running():
+    return "pygame.mixer" in sys.modules and bool(get_mixer().get_init())
+
+
+class SampleBank:
+    def __init__(self, sounds_dir=SOUNDS_DIR, memory_budget=DEFAULT_MEMORY_BUDGET, use_disk_cache=True):
+        self.sounds_dir = sounds_dir
+        self.cache_dir = os.path.join(sounds_dir, ".cache")
+        self.memory_budget = memory_budget
+        self.use_disk_cache = use_disk_cache
+        self.files = {}  # note key ("E+1") -> path of the wav file
+        self.samples = OrderedDict()  # note key -> (Sound, size), least recently used first
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.scanned = False
+        self.lock = threading.RLock()
+        self.prefetch_generation = 0
+
+    def scan(self, force=False):
+        # Index the available wav files without decoding any of them
+        with self.lock:
+            if self.scanned and not force:
+                return
+            self.scanned = True
+            self.files = {}
+
+        if not os.path.exists(self.sounds_dir):
+            os.makedirs(self.sounds_dir)
+            print(f"Created sounds directory at {self.sounds_dir}")
+            print("Please add sound files in format Note+Octave.wav (e.g., C+3.wav)")
+            return
+
+        files = {}
+        for file_name in os.listdir(self.sounds_dir):
+            if file_name.endswith(".wav"):
+                note_key = file_name[:-len(".wav")]
+                if "+" in note_key:
+                    files[note_key] = os.path.join(self.sounds_dir, file_name)
+        with self.lock:
+            self.files = files
+
+    def __contains__(self, note_key):
+        self.scan()
+        return note_key in self.files
+
+    def init_mixer(self):
+        mixer = get_mixer()
+        if not mixer.get_init():
+            mixer.init()
+        return mixer.get_init()
+
+    def stop_all(self):
+        if mixer_running():
+            get_mixer().stop()
+
+    def get(self, note_key):
+        # Return the Sound for note_key, decoding it on first use. Only notes with a sound
+        # file count as misses; the rest are the synthesizer's, not the cache's
+        with self.lock:
+            entry = self.samples.get(note_key)
+            if entry is not None:
+                self.samples.move_to_end(note_key)
+                self.hits += 1
+                return entry[0]
+        self.scan()
+        if note_key not in self.files:
+            return None
+        with self.lock:
+            self.misses += 1
+        return self.load(note_key)
+
+    def load(self, note_key):
+        self.scan()
+        path = self.files.get(note_key)
+        if path is None:
+            return None
+
+        mixer_format = self.init_mixer()
+        try:
+            sound, size = self._load_cached(note_key, path, mixer_format)
+            if sound is None:
+                sound = get_mixer().Sound(path)
+                size = self._sound_size(sound, mixer_format)
+                self._write_cache(note_key, path, sound, mixer_format)
+        except Exception as e:
+            print(f"Error loading sound file {os.path.basename(path)}: {str(e)}")
+            return None
+
+        with self.lock:
+            # Another thread may have decoded the same note in the meantime
+            entry = self.samples.get(note_key)
+            if entry is not None:
+                self.samples.move_to_end(note_key)
+                return entry[0]
+            self.samples[note_key] = (sound, size)
+            self.memory_used += size
+            self.evict(keep=note_key)
+        return sound
+
+    def evict(self, keep=None):
+        # Drop least recently used samples until we are back under the memory budget
+        with self.lock:
+            while self.memory_used > self.memory_budget and self.samples:
+                note_key = next(iter(self.samples))
+                if note_key == keep:
+                    if len(self.samples) == 1:
+                        break
+                    self.samples.move_to_end(note_key)
+                    continue
+                _, size = self.samples.pop(note_key)
+                self.memory_used -= size
+
+    def set_memory_budget(self, memory_budget):
+        self.memory_budget = memory_budget
+        self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.memory_used = 0
+
+    def prefetch(self, note_keys):
+        # Decode note_keys on a background thread; a newer prefetch cancels an older one
+        with self.lock:
+            self.prefetch_generation += 1
+            generation = self.prefetch_generation
+        thread = threading.Thread(target=self._prefetch, args=(list(note_keys), generation), daemon=True)
+        thread.start()
+        return thread
+
+    def _prefetch(self, note_keys, generation):
+        for note_key in note_keys:
+            if generation != self.prefetch_generation:
+                return
+            with self.lock:
+                if note_key in self.samples:
+                    continue
+                # Prefetching must never push out samples that are already in use
+                if self.memory_used >= self.memory_budget:
+                    return
+            if note_key in self:
+                self.load(note_key)
+
+    def _cache_path(self, note_key, mixer_format):
+        frequency, size, channels = mixer_format
+        return os.path.join(self.cache_dir, f"{note_key}-{frequency}-{size}-{channels}.pcm")
+
+    def _load_cached(self, note_key, path, mixer_format):
+        if not self.use_disk_cache:
+            return None, 0
+        cache_path = self._cache_path(note_key, mixer_format)
+        try:
+            if os.path.getmtime(cache_path) < os.path.getmtime(path):
+                return None, 0
+            with open(cache_path, "rb") as cache_file:
+                with mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as pcm:
+                    return get_mixer().Sound(buffer=pcm), len(pcm)
+        except (OSError, ValueError):
+            # Missing, empty or unreadable cache entry: fall back to parsing the wav
+            return None, 0
+
+    def _write_cache(self, note_key, path, sound, mixer_format):
+        if not self.use_disk_cache:
+            return
+        cache_path = self._cache_path(note_key, mixer_format)
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "wb") as cache_file:
+                cache_file.write(sound.get_raw())
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"Could not cache decoded sound {note_key}: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _sound_size(self, sound, mixer_format):
+        frequency, size, channels = mixer_format
+        return int(round(sound.get_length() * frequency)) * channels * abs(size) // 8
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_sample_bank():
+    # All instruments share one bank so each sample is decoded once per process
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = SampleBank()
+        return _bank
@@ -0,0 +1,187 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+
+class Sequencer:
+    def __init__(self, instrument, lookahead=0.02, spin=0.002):
+        self.instrument = instrument  # anything with play_note(note) and stop_all_sounds()
+        self.lookahead = lookahead  # events due within this window are committed to
+        self.spin = spin  # the last stretch before an event is busy-waited for accuracy
+        self.tempo = 60.0
+        self.chords = []
+        self.beats = []  # start beat of every chord
+        self.length = 0.0  # song length in beats
+        self.next_index = 0
+        self.playing = False
+        self.paused_beat = 0.0
+        self.anchor_time = 0.0
+        self.anchor_beat = 0.0
+        self.generation = 0  # bumped on every pause/seek/tempo change
+        self.seek_generation = 0  # bumped on seeks only
+        self.jitter = deque(maxlen=512)  # lateness of fired events, in seconds
+        self.on_finished = None  # called from the sequencer thread
+        self.prepare = None  # called once on the sequencer thread before the first chord fires
+        self.condition = threading.Condition()
+        self.thread = None
+        self.closing = False
+
+    def load(self, chords, durations=None, tempo=None, prepare=None):
+        with self.condition:
+            self.chords = list(chords)
+            self.prepare = prepare
+            if durations is None:
+                durations = [1.0] * len(self.chords)
+            self.beats = []
+            beat = 0.0
+            for duration in durations:
+                self.beats.append(beat)
+                beat += duration
+            self.length = beat
+            if tempo is not None:
+                self.tempo = float(tempo)
+            self._seek(0.0)
+
+    def load_song(self, sheet_music):
+        # Chords iterate as Notes, so each note reaches the instrument with its string.
+        # The song's sounds are prepared on the sequencer thread, so starting never blocks the caller
+        self.load(sheet_music.song, sheet_music.durations, sheet_music.tempo, sheet_music.prefetch_song)
+
+    def position(self):
+        # Current song position in beats
+        with self.condition:
+            return self._position()
+
+    def _position(self):
+        if not self.playing:
+            return self.paused_beat
+        return self.anchor_beat + (time.monotonic() - self.anchor_time) * self.tempo / 60.0
+
+    def _time_of(self, beat):
+        return self.anchor_time + (beat - self.anchor_beat) * 60.0 / self.tempo
+
+    def set_tempo(self, tempo):
+        if tempo <= 0:
+            raise ValueError("Tempo must be positive")
+        with self.condition:
+            beat = self._position()
+            self.tempo = float(tempo)
+            self._anchor(beat)
+
+    def start(self):
+        with self.condition:
+            if self.playing:
+                return
+            if self.next_index >= len(self.chords):
+                self._seek(0.0)
+            self.playing = True
+            self.closing = False
+            self._anchor(self.paused_beat)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def pause(self):
+        with self.condition:
+            if self.playing:
+                self.paused_beat = self._position()
+                self.playing = False
+                self.generation += 1
+                self.condition.notify_all()
+
+    def seek(self, beat):
+        with self.condition:
+            self._seek(beat)
+
+    def seek_chord(self, index):
+        with self.condition:
+            if 0 <= index < len(self.beats):
+                self._seek(self.beats[index])
+
+    def stop(self):
+        with self.condition:
+            self.playing = False
+            self.closing = True
+            self._seek(0.0)
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+        self.instrument.stop_all_sounds()
+
+    def _seek(self, beat):
+        beat = min(max(beat, 0.0), self.length)
+        self.next_index = bisect.bisect_left(self.beats, beat)
+        self.paused_beat = beat
+        self.seek_generation += 1
+        self._anchor(beat)
+
+    def _anchor(self, beat):
+        self.anchor_time = time.monotonic()
+        self.anchor_beat = beat
+        self.generation += 1
+        self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.closing:
+                    return
+                if not self.playing:
+                    self.condition.wait()
+                    continue
+                prepare = self.prepare
+                if prepare is not None:
+                    self.prepare = None
+                    self.condition.release()
+                    try:
+                        prepare()
+                    finally:
+                        self.condition.acquire()
+                    # The clock starts once everything is ready, so the first chords are not late
+                    if self.playing:
+                        self._anchor(self.anchor_beat)
+                    continue
+                if self.next_index >= len(self.chords):
+                    self.playing = False
+                    self.paused_beat = self.length
+                    finished = self.on_finished
+                    self.condition.release()
+                    try:
+                        if finished is not None:
+                            finished()
+                    finally:
+                        self.condition.acquire()
+                    continue
+
+                due = self._time_of(self.beats[self.next_index])
+                delay = due - time.monotonic()
+                if delay > self.lookahead:
+                    # Sleep until the event enters the lookahead window, waking early on pause/seek
+                    self.condition.wait(delay - self.lookahead)
+                    continue
+
+                index = self.next_index
+                chord = self.chords[index]
+                self.next_index += 1
+                generation = self.generation
+                seek_generation = self.seek_generation
+
+            self._wait_until(due)
+
+            with self.condition:
+                if generation != self.generation:
+                    # Paused, seeked or retimed while we were waiting: reschedule
+                    if seek_generation == self.seek_generation:
+                        self.next_index = index
+                    continue
+            self.jitter.append(time.monotonic() - due)
+            for note in chord:
+                self.instrument.play_note(note)
+
+    def _wait_until(self, due):
+        remaining = due - time.monotonic()
+        if remaining > self.spin:
+            time.sleep(remaining - self.spin)
+        while time.monotonic() < due:
+            pass
@@ -0,0 +1,239 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+from pitch import NO_POSITION, Chord, as_pitch
+from midi import GUITAR_OCTAVE_SHIFT
+
+# Binary song layout (little endian):
+#   header   magic, version, notes per record, capo, chord count, tempo, data/index
+#            offsets, name and tuning lengths, MIDI octave shift (version 2 on), then
+#            the utf-8 name and tuning
+#   records  one fixed-width record per chord: beats (f64; f32 before version 3), note
+#            count (u8), then notes-per-record bytes each of pitches, strings and frets
+#   index    start beat (f64) of every INDEX_STRIDE-th chord, for seeking by time
+MAGIC = b"HSNG"
+VERSION = 3
+PREFIX = struct.Struct("<4sH")  # magic and version, which decide the rest of the header
+HEADERS = {
+    1: struct.Struct("<4sHBBIdQQHH"),  # the capo byte was padding before, so old files read as capo 0
+    2: struct.Struct("<4sHBBIdQQHHb"),
+    3: struct.Struct("<4sHBBIdQQHHb"),
+}
+HEADER = HEADERS[VERSION]
+# Beats are doubles, like the seek index, so seeking and summing records agree exactly
+BEAT_FORMATS = {1: "f", 2: "f", 3: "d"}
+INDEX_STRIDE = 1024
+JSON_FORMAT = "harmonic-song"
+
+
+def _record_struct(notes_per_record, beat_format=BEAT_FORMATS[VERSION]):
+    return struct.Struct(f"<{beat_format}B{notes_per_record}s{notes_per_record}s{notes_per_record}s")
+
+
+def save_song(path, chords, name="Untitled", tuning="standard", tempo=60, capo=0, octave_shift=GUITAR_OCTAVE_SHIFT):
+    chords = list(chords)
+    notes_per_record = max([len(chord.pitches) for chord in chords] + [1])
+    if notes_per_record > 255:
+        raise ValueError("Chords with more than 255 notes cannot be saved")
+    record = _record_struct(notes_per_record)
+    name_bytes = name.encode("utf-8")
+    tuning_bytes = tuning.encode("utf-8")
+
+    data_offset = HEADER.size + len(name_bytes) + len(tuning_bytes)
+    data_offset += -data_offset % 8
+    index_offset = data_offset + record.size * len(chords)
+    index_offset += -index_offset % 8
+    index_count = (len(chords) + INDEX_STRIDE - 1) // INDEX_STRIDE
+
+    buffer = bytearray(index_offset + 8 * index_count)
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION, notes_per_record, capo, len(chords), float(tempo),
+                     data_offset, index_offset, len(name_bytes), len(tuning_bytes), octave_shift)
+    buffer[HEADER.size:HEADER.size + len(name_bytes)] = name_bytes
+    buffer[HEADER.size + len(name_bytes):HEADER.size + len(name_bytes) + len(tuning_bytes)] = tuning_bytes
+
+    unplaced = bytes([NO_POSITION]) * notes_per_record
+    offset = data_offset
+    beat = 0.0
+    index = []
+    for chord_idx, chord in enumerate(chords):
+        if chord_idx % INDEX_STRIDE == 0:
+            index.append(beat)
+        record.pack_into(buffer, offset, chord.beats, len(chord.pitches), chord.pitches,
+                         chord.strings or unplaced, chord.frets or unplaced)
+        offset += record.size
+        beat += chord.beats
+    struct.pack_into(f"<{index_count}d", buffer, index_offset, *index)
+
+    # Per process and thread, so batch workers writing next to each other never share one
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as song_file:
+        song_file.write(buffer)
+    os.replace(temp_path, path)
+
+
+class SongFile:
+    # Memory-mapped view of a saved song: random access and streaming without reading it all
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} is not a song file")
+        try:
+            self._read_header()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_header(self):
+        # Every offset and count is checked against the file size, so a truncated or corrupt
+        # file is a ValueError here rather than a struct.error on some later read
+        path = self.path
+        size = len(self.map)
+        if size < PREFIX.size:
+            raise ValueError(f"{path} is not a song file")
+        magic, version = PREFIX.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a song file")
+        header = HEADERS.get(version)
+        if header is None:
+            raise ValueError(f"Unsupported song file version {version} in {path}")
+        if size < header.size:
+            raise ValueError(f"{path} is truncated or corrupt")
+        fields = header.unpack_from(self.map, 0)
+        (self.notes_per_record, self.capo, self.chord_count, self.tempo, self.data_offset, self.index_offset,
+         name_length, tuning_length) = fields[2:10]
+        # Version 1 songs were all in the fretboard's octave numbering
+        self.octave_shift = fields[10] if version >= 2 else GUITAR_OCTAVE_SHIFT
+        start = header.size
+        if start + name_length + tuning_length > min(size, self.data_offset):
+            raise ValueError(f"{path} is truncated or corrupt")
+        self.name = self.map[start:start + name_length].decode("utf-8")
+        start += name_length
+        self.tuning = self.map[start:start + tuning_length].decode("utf-8")
+        self.beat = struct.Struct("<" + BEAT_FORMATS[version])
+        self.record = _record_struct(self.notes_per_record, BEAT_FORMATS[version])
+        index_count = (self.chord_count + INDEX_STRIDE - 1) // INDEX_STRIDE
+        if (self.data_offset + self.chord_count * self.record.size > size
+                or self.index_offset + 8 * index_count > size):
+            raise ValueError(f"{path} is truncated or corrupt")
+        self.index = struct.unpack_from(f"<{index_count}d", self.map, self.index_offset)
+        self.chords = {}  # raw record -> Chord; songs repeat chords, so identical records share one
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.chord_count
+
+    def _chord(self, raw):
+        chord = self.chords.get(raw)
+        if chord is None:
+            beats, count, pitches, strings, frets = self.record.unpack(raw)
+            chord = Chord(pitches[:count], strings[:count], frets[:count], beats)
+            if len(self.chords) < 65536:
+                self.chords[raw] = chord
+        return chord
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.chord_count
+        if not 0 <= index < self.chord_count:
+            raise IndexError("chord index out of range")
+        offset = self.data_offset + index * self.record.size
+        return self._chord(self.map[offset:offset + self.record.size])
+
+    def __iter__(self):
+        return self.iter_chords()
+
+    def iter_chords(self, start=0, stop=None):
+        # Stream chords one record at a time straight out of the mapping
+        stop = self.chord_count if stop is None else min(stop, self.chord_count)
+        if start >= stop:
+            return
+        size = self.record.size
+        begin = self.data_offset + start * size
+        for offset in range(begin, begin + (stop - start) * size, size):
+            yield self._chord(self.map[offset:offset + size])
+
+    def beat_of(self, index):
+        # Start beat of chord `index`, using the index to skip all but the last stretch
+        block, offset = divmod(index, INDEX_STRIDE)
+        beat = self.index[block] if self.index else 0.0
+        first = self.data_offset + block * INDEX_STRIDE * self.record.size
+        for i in range(offset):
+            beat += self.beat.unpack_from(self.map, first + i * self.record.size)[0]
+        return beat
+
+    def chord_at_beat(self, beat):
+        # Index of the chord sounding at `beat`
+        if not self.chord_count:
+            return None
+        block = max(0, bisect.bisect_right(self.index, beat) - 1)
+        index = block * INDEX_STRIDE
+        position = self.index[block]
+        last = min(index + INDEX_STRIDE, self.chord_count) - 1
+        while index < last:
+            position += self.beat.unpack_from(self.map, self.data_offset + index * self.record.size)[0]
+            if position > beat:
+                break
+            index += 1
+        return index
+
+
+def open_song(path):
+    return SongFile(path)
+
+
+def load_song(path):
+    # -> (name, tuning, tempo, list of Chords, capo, MIDI octave shift)
+    with SongFile(path) as song_file:
+        return (song_file.name, song_file.tuning, song_file.tempo, list(song_file), song_file.capo,
+                song_file.octave_shift)
+
+
+def export_json(path, chords, name="Untitled", tuning="standard", tempo=60, capo=0, octave_shift=GUITAR_OCTAVE_SHIFT):
+    data = {
+        "format": JSON_FORMAT,
+        "version": VERSION,
+        "name": name,
+        "tuning": tuning,
+        "capo": capo,
+        "octave_shift": octave_shift,
+        "tempo": tempo,
+        "chords": [
+            {"beats": chord.beats, "notes": [note.to_dict() for note in chord.notes()]}
+            for chord in chords
+        ],
+    }
+    with open(path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, indent=1)
+
+
+def import_json(path):
+    # -> (name, tuning, tempo, list of Chords, capo, MIDI octave shift)
+    with open(path, "r", encoding="utf-8") as json_file:
+        data = json.load(json_file)
+    if data.get("format") != JSON_FORMAT:
+        raise ValueError(f"{path} is not a song export")
+    chords = []
+    for chord in data.get("chords", []):
+        notes = chord.get("notes", [])
+        chords.append(Chord([as_pitch(note) for note in notes],
+                            [note.get("string", NO_POSITION) for note in notes],
+                            [note.get("fret", NO_POSITION) for note in notes],
+                            chord.get("beats", 1)))
+    return (data.get("name", "Untitled"), data.get("tuning", "standard"), data.get("tempo", 60), chords,
+            data.get("capo", 0), data.get("octave_shift", GUITAR_OCTAVE_SHIFT))
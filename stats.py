@@ -0,0 +1,154 @@
+import csv
+import json
+import sys
+import threading
+import time
+from collections import deque
+from pitch import PITCH_LABELS
+
+# One row per note that was asked to sound; times are perf_counter seconds and the
+# stage durations are in milliseconds:
+#   lookup  click -> note found on the fretboard
+#   sample  note found -> Sound ready (sample bank or synthesizer)
+#   play    Sound.play() call
+#   total   click (or play_note entry for song playback) -> sound started
+EVENT_FIELDS = ("time", "source", "pitch", "note", "lookup_ms", "sample_ms", "play_ms", "total_ms",
+                "busy_channels", "channels", "result")
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def busy_channels():
+    # -> (busy, total) mixer channels, or (0, 0) before the mixer is running
+    if "pygame.mixer" not in sys.modules:
+        return 0, 0
+    from pygame import mixer
+    if not mixer.get_init():
+        return 0, 0
+    total = mixer.get_num_channels()
+    return sum(1 for i in range(total) if mixer.Channel(i).get_busy()), total
+
+
+def summarise(values, scale=1000.0):
+    # -> mean/p50/p95/max of values, scaled to milliseconds
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": scale * sum(values) / len(values),
+        "p50": scale * percentile(values, 0.5),
+        "p95": scale * percentile(values, 0.95),
+        "max": scale * max(values),
+    }
+
+
+class PlaybackStats:
+    # Disabled by default: callers check `enabled` before taking any timestamps, so the
+    # only cost left on the play path is that attribute lookup
+    def __init__(self, history=4096):
+        self.enabled = False
+        self.events = deque(maxlen=history)
+        self.played = 0
+        self.missing = 0  # no sound file and no synthesizer
+        self.lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.events.clear()
+            self.played = 0
+            self.missing = 0
+
+    def record_play(self, source, pitch, clicked, found, loaded, started):
+        # Every note that has a Sound plays: a full voice pool steals a voice rather than dropping it
+        busy, total = busy_channels()
+        with self.lock:
+            self.played += 1
+            self.events.append((started, source, pitch, found - clicked, loaded - found, started - loaded,
+                                started - clicked, busy, total, "played"))
+
+    def record_missing(self, source, pitch):
+        with self.lock:
+            self.missing += 1
+            self.events.append((time.perf_counter(), source, pitch, 0.0, 0.0, 0.0, 0.0, 0, 0, "missing"))
+
+    def summary(self, bank=None, sequencer=None, voices=None):
+        with self.lock:
+            events = list(self.events)
+            played, missing = self.played, self.missing
+        sounded = [event for event in events if event[9] == "played"]
+        clicks = [event for event in sounded if event[1] == "click"]
+        busy = [event[7] for event in events if event[8]]
+        summary = {
+            "enabled": self.enabled,
+            "played": played,
+            "missing": missing,
+            "click_latency_ms": summarise([event[6] for event in clicks]),
+            "note_lookup_ms": summarise([event[3] for event in clicks]),
+            "sample_ms": summarise([event[4] for event in sounded]),
+            "play_call_ms": summarise([event[5] for event in sounded]),
+            "busy_channels": {
+                "mean": sum(busy) / len(busy) if busy else 0.0,
+                "max": max(busy, default=0),
+                "channels": max((event[8] for event in events), default=0),
+            },
+        }
+        if bank is not None:
+            lookups = bank.hits + bank.misses
+            summary["sample_cache"] = {
+                "hits": bank.hits,
+                "misses": bank.misses,
+                "hit_rate": bank.hits / lookups if lookups else None,
+                "loaded": len(bank.samples),
+                "memory_used": bank.memory_used,
+            }
+        if voices is not None:
+            summary["voices"] = {
+                "voices": voices.num_voices,
+                "busy": voices.busy(),
+                "stolen": voices.stolen,
+                "choked": voices.choked,
+            }
+        if sequencer is not None:
+            summary["scheduler_jitter_ms"] = summarise(list(sequencer.jitter))
+        return summary
+
+    def export(self, path, bank=None, sequencer=None, voices=None):
+        # .csv gets one row per event, anything else a JSON document with the summary too
+        with self.lock:
+            events = list(self.events)
+        rows = [dict(zip(EVENT_FIELDS, self._row(event))) for event in events]
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8") as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=EVENT_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            with open(path, "w", encoding="utf-8") as json_file:
+                json.dump({"summary": self.summary(bank, sequencer, voices), "events": rows}, json_file, indent=1)
+
+    def _row(self, event):
+        started, source, pitch, lookup, sample, play, total, busy, total_channels, result = event
+        return (f"{started:.6f}", source, pitch, PITCH_LABELS[pitch], round(lookup * 1000, 3),
+                round(sample * 1000, 3), round(play * 1000, 3), round(total * 1000, 3),
+                busy, total_channels, result)
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_stats():
+    # One collector per process, shared by every instrument like the sample bank
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = PlaybackStats()
+        return _stats
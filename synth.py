@@ -0,0 +1,156 @@
+import math
+import threading
+import numpy as np
+
+SAMPLE_RATE = 44100
+
+# transpose: the fretboard numbers octaves one lower than concert pitch (its "E1" is a
+# guitar's low E, 82 Hz), so the string voice is raised an octave to sound where it should
+VOICES = {
+    "string": {"transpose": 12, "duration": 2.5},
+    "piano": {"transpose": 0, "duration": 3.0},
+}
+FADE_SECONDS = 0.05
+PEAK = 0.8
+
+
+def frequency(pitch):
+    return 440.0 * 2.0 ** ((pitch - 69) / 12.0)
+
+
+def pluck(freq, sample_rate=SAMPLE_RATE, duration=2.5, decay=0.996, seed=0):
+    # Karplus-Strong plucked string: y[n] = decay * (y[n - N] + y[n - N - 1]) / 2.
+    # Unrolling the recurrence m periods gives y[n] = sum_j K_j * y[n - mN - j] with a
+    # binomial kernel K, so each NumPy convolution advances the string by m whole periods.
+    period = sample_rate / freq
+    delay = max(2, int(period))
+    length = max(int(duration * sample_rate * delay / period), delay + 1)
+    noise = np.random.default_rng(seed).uniform(-1.0, 1.0, delay + 1)
+    # Soften the excitation a little so the attack is less harsh
+    noise = np.convolve(noise - noise.mean(), (0.25, 0.5, 0.25), mode="same")
+
+    wave = np.zeros(length, dtype=np.float64)
+    wave[:delay + 1] = noise
+    steps = max(1, min(64, 2048 // delay))
+    block = steps * delay
+    kernel = np.array([math.comb(steps, j) for j in range(steps + 1)], dtype=np.float64) * (0.5 * decay) ** steps
+
+    start = delay + 1
+    # Run single periods until there is enough history for the unrolled kernel
+    while start < min(block + steps, length):
+        end = min(start + delay, length)
+        wave[start:end] = 0.5 * decay * (wave[start - delay:end - delay] + wave[start - delay - 1:end - delay - 1])
+        start = end
+    while start < length:
+        end = min(start + block, length)
+        wave[start:end] = np.convolve(wave[start - block - steps:start], kernel, mode="valid")[:end - start]
+        start = end
+
+    # The integer delay line runs slightly sharp; resample to land on the exact pitch
+    target = int(duration * sample_rate)
+    positions = np.linspace(0, length - 1, target)
+    return np.interp(positions, np.arange(length), wave)
+
+
+def piano(freq, sample_rate=SAMPLE_RATE, duration=3.0, harmonics=10, inharmonicity=0.0004):
+    # Additive piano-like tone: slightly stretched partials, higher ones dying away faster.
+    # Each partial is only computed until it has decayed by 60 dB.
+    length = int(duration * sample_rate)
+    t = np.arange(length, dtype=np.float32) / np.float32(sample_rate)
+    wave = np.zeros(length, dtype=np.float32)
+    for k in range(1, harmonics + 1):
+        partial = k * freq * np.sqrt(1.0 + inharmonicity * k * k)
+        if partial >= sample_rate / 2:
+            break
+        decay_rate = 1.2 + 0.6 * k + freq / 400.0
+        audible = min(length, int(6.9 / decay_rate * sample_rate))
+        tk = t[:audible]
+        wave[:audible] += np.sin(np.float32(2 * np.pi * partial) * tk) * np.exp(np.float32(-decay_rate) * tk) \
+            * np.float32(1.0 / k ** 1.5)
+    attack = int(0.005 * sample_rate)
+    wave[:attack] *= np.linspace(0.0, 1.0, attack, dtype=np.float32)
+    return wave
+
+
+GENERATORS = {"string": pluck, "piano": piano}
+
+
+def finish(wave, sample_rate=SAMPLE_RATE):
+    # Normalise and fade the tail out so the note never ends in a click
+    peak = np.abs(wave).max()
+    if peak > 0:
+        wave = wave * (PEAK / peak)
+    fade = min(len(wave), int(FADE_SECONDS * sample_rate))
+    if fade:
+        wave[-fade:] *= np.linspace(1.0, 0.0, fade)
+    return wave.astype(np.float32)
+
+
+def to_mixer_format(wave, size, channels):
+    # float32 mono -> raw PCM bytes in the mixer's (size, channels) format
+    if size == 32:
+        data = wave
+    elif abs(size) == 16:
+        data = np.round(wave * 32767.0).astype(np.int16)
+        if size > 0:
+            data = (data.astype(np.int32) + 32768).astype(np.uint16)
+    elif abs(size) == 8:
+        data = np.round(wave * 127.0).astype(np.int8)
+        if size > 0:
+            data = (data.astype(np.int16) + 128).astype(np.uint8)
+    else:
+        raise ValueError(f"Unsupported mixer sample size {size}")
+    if channels > 1:
+        data = np.repeat(data[:, None], channels, axis=1)
+    return np.ascontiguousarray(data).tobytes()
+
+
+class Synthesizer:
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.waves = {}  # (voice, pitch, sample rate) -> float32 mono wave
+        self.sounds = {}  # (voice, pitch, mixer format) -> pygame Sound
+        self.lock = threading.Lock()
+
+    def wave(self, voice, pitch, sample_rate=None):
+        sample_rate = sample_rate or self.sample_rate
+        key = (voice, pitch, sample_rate)
+        wave = self.waves.get(key)
+        if wave is None:
+            settings = VOICES[voice]
+            freq = frequency(pitch + settings["transpose"])
+            raw = GENERATORS[voice](freq, sample_rate, settings["duration"])
+            wave = finish(raw, sample_rate)
+            with self.lock:
+                self.waves[key] = wave
+        return wave
+
+    def sound(self, voice, pitch, mixer_format):
+        # Sounds are built straight from the PCM buffer, never through a temp file
+        key = (voice, pitch, mixer_format)
+        sound = self.sounds.get(key)
+        if sound is None:
+            from pygame import mixer
+            frequency_hz, size, channels = mixer_format
+            wave = self.wave(voice, pitch, frequency_hz)
+            sound = mixer.Sound(buffer=to_mixer_format(wave, size, channels))
+            with self.lock:
+                self.sounds[key] = sound
+        return sound
+
+    def generate(self, voice, pitches):
+        # Pre-generate a range of pitches, e.g. the whole fretboard for the current tuning
+        for pitch in dict.fromkeys(pitches):
+            self.wave(voice, pitch)
+
+
+_synthesizer = None
+_synthesizer_lock = threading.Lock()
+
+
+def get_synthesizer():
+    global _synthesizer
+    with _synthesizer_lock:
+        if _synthesizer is None:
+            _synthesizer = Synthesizer()
+        return _synthesizer
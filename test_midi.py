@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from midi import CHUNK, HEADER, MidiFile, export_midi, import_midi
+from pitch import Chord
+from tunings import get_tuning_registry
+
+KEYS = range(21, 109)
+
+
+def write_midi(path, *tracks, ticks_per_beat=480):
+    data = CHUNK.pack(b"MThd", HEADER.size) + HEADER.pack(1 if len(tracks) > 1 else 0, len(tracks), ticks_per_beat)
+    for track in tracks:
+        data += CHUNK.pack(b"MTrk", len(track)) + track
+    with open(path, "wb") as midi_file:
+        midi_file.write(data)
+    return str(path)
+
+
+def chords_of(path, **options):
+    with MidiFile(path) as midi_file:
+        return [(list(pitches), beats) for pitches, beats in midi_file.chords(**options)]
+
+
+def test_running_status_and_velocity_zero_note_offs(tmp_path):
+    track = bytes([
+        0x00, 0x90, 60, 90,  # C4 on
+        0x00, 64, 90,  # E4 on, running status
+        0x83, 0x60, 60, 0,  # 480 ticks later: C4 off as a note-on with velocity 0
+        0x00, 64, 0,
+        0x00, 67, 90,  # G4 on, still running status
+        0x81, 0x70, 0x80, 67, 0,  # 240 ticks later, a real note-off
+        0x00, 0xFF, 0x2F, 0x00,
+    ])
+    path = write_midi(tmp_path / "running.mid", track)
+    assert chords_of(path) == [([60, 64], 1.0), ([67], 0.5)]
+
+
+def test_tracks_are_merged_by_time(tmp_path):
+    conductor = b"\x00\xff\x03\x04Song" + b"\x00\xff\x51\x03\x07\xa1\x20" + b"\x00\xff\x2f\x00"
+    bass = bytes([0x00, 0x90, 48, 90, 0x83, 0x60, 0x80, 48, 0, 0x00, 0x90, 43, 90, 0x83, 0x60, 0x80, 43, 0,
+                  0x00, 0xFF, 0x2F, 0x00])
+    melody = bytes([0x00, 0x91, 64, 90, 0x83, 0x60, 0x81, 64, 0, 0x00, 0x91, 71, 90, 0x83, 0x60, 0x81, 71, 0,
+                    0x00, 0xFF, 0x2F, 0x00])
+    path = write_midi(tmp_path / "tracks.mid", conductor, bass, melody)
+    with MidiFile(path) as midi_file:
+        assert [(list(pitches), beats) for pitches, beats in midi_file.chords()] == [([48, 64], 1.0), ([43, 71], 1.0)]
+        assert midi_file.tempo == 120.0
+        assert midi_file.name == "Song"
+
+
+def test_drum_channel_is_skipped(tmp_path):
+    track = bytes([0x00, 0x99, 36, 100, 0x00, 0x90, 60, 90, 0x83, 0x60, 0x89, 36, 0, 0x00, 0x80, 60, 0,
+                   0x00, 0xFF, 0x2F, 0x00])
+    path = write_midi(tmp_path / "drums.mid", track)
+    assert chords_of(path) == [([60], 1.0)]
+    assert chords_of(path, skip_drums=False) == [([36, 60], 1.0)]
+
+
+def test_truncated_and_foreign_files_raise_value_error(tmp_path):
+    track = bytes([0x00, 0x90, 60, 90, 0x83, 0x60, 0x80, 60, 0, 0x00, 0xFF, 0x2F, 0x00])
+    path = write_midi(tmp_path / "whole.mid", track)
+    with open(path, "rb") as midi_file:
+        data = midi_file.read()
+    truncated = tmp_path / "truncated.mid"
+    truncated.write_bytes(data[:-8])
+    with pytest.raises(ValueError):
+        import_midi(str(truncated), keys=KEYS)
+    foreign = tmp_path / "foreign.mid"
+    foreign.write_bytes(b"RIFF not a midi file")
+    with pytest.raises(ValueError):
+        import_midi(str(foreign), keys=KEYS)
+
+
+def test_export_round_trip(tmp_path):
+    song = [Chord([40, 47, 52], None, None, 1.0), Chord([45], None, None, 0.5), Chord([43, 47, 50, 55], None, None, 2.0)]
+    path = str(tmp_path / "song.mid")
+    export_midi(path, song, "Round trip", 90, octave_shift=0)
+    name, tempo, chords = import_midi(path, keys=KEYS, octave_shift=0)
+    assert name == "Round trip"
+    assert tempo == pytest.approx(90.0, abs=0.01)
+    assert [(chord.pitches, chord.beats) for chord in chords] == [(chord.pitches, chord.beats) for chord in song]
+
+
+def test_unplaceable_chords_keep_their_pitches(tmp_path):
+    strings, fret_index = get_tuning_registry().layout("standard")
+    # Seven notes cannot go on six strings, and 27 is below the low E
+    song = [Chord([28, 35, 40], None, None), Chord([40, 42, 44, 45, 47, 49, 51], None, None),
+            Chord([27, 60], None, None)]
+    path = str(tmp_path / "song.mid")
+    export_midi(path, song, octave_shift=12)
+    _, _, chords = import_midi(path, strings, fret_index)
+    assert [chord.pitches for chord in chords] == [chord.pitches for chord in song]
+    assert [chord.placed for chord in chords] == [True, False, False]
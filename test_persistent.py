@@ -0,0 +1,124 @@
+import os
+import random
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from instruments import Sheet_Music
+from persistent import CHUNK_SIZE, PersistentList, _height, _size
+from tunings import get_tuning_registry
+from voicings import place_chord
+
+
+def check_tree(node):
+    # -> height; asserts the cached size and height, the AVL balance and the chunk bounds
+    if node is None:
+        return 0
+    left, right = check_tree(node.left), check_tree(node.right)
+    assert abs(left - right) <= 1
+    assert 1 <= len(node.items) <= 2 * CHUNK_SIZE
+    assert node.size == _size(node.left) + _size(node.right) + len(node.items)
+    assert node.height == max(left, right) + 1 == _height(node)
+    return node.height
+
+
+def test_edits_match_a_python_list():
+    rng = random.Random(0)
+    expected = list(range(500))
+    persistent = PersistentList(expected)
+    versions = [(persistent, list(expected))]
+    for step in range(3000):
+        op = rng.choice(("insert", "append", "delete", "set", "move"))
+        if op == "insert":
+            index = rng.randint(-len(expected) - 5, len(expected) + 5)
+            persistent = persistent.insert(index, step)
+            expected.insert(index, step)
+        elif op == "append":
+            persistent = persistent.append(step)
+            expected.append(step)
+        elif not expected:
+            continue
+        elif op == "delete":
+            index = rng.randrange(-len(expected), len(expected))
+            persistent = persistent.delete(index)
+            del expected[index]
+        elif op == "set":
+            index = rng.randrange(-len(expected), len(expected))
+            persistent = persistent.set(index, step)
+            expected[index] = step
+        else:
+            source = rng.randrange(len(expected))
+            destination = rng.randint(-3, len(expected) + 3)
+            persistent = persistent.move(source, destination)
+            value = expected.pop(source)
+            expected.insert(min(max(destination, 0), len(expected)), value)
+        if step % 100 == 0:
+            versions.append((persistent, list(expected)))
+            assert list(persistent) == expected
+            check_tree(persistent.root)
+    assert list(persistent) == expected
+    assert len(persistent) == len(expected)
+    assert [persistent[i] for i in range(-len(expected), len(expected))] == expected + expected
+    assert persistent[3:40:3] == expected[3:40:3]
+    check_tree(persistent.root)
+    # Every edit left the earlier versions untouched
+    for version, contents in versions:
+        assert list(version) == contents
+
+
+def test_inserts_in_one_place_keep_the_tree_balanced():
+    persistent = PersistentList()
+    for value in range(2000):
+        persistent = persistent.insert(len(persistent) // 2, value)
+    check_tree(persistent.root)
+    while len(persistent):
+        persistent = persistent.delete(0)
+        if len(persistent) % 250 == 0:
+            check_tree(persistent.root)
+    assert persistent.root is None
+
+
+def test_sheet_music_undo_and_redo():
+    strings, fret_index = get_tuning_registry().layout("standard")
+    chords = [place_chord(strings, fret_index, pitches) for pitches in ([40, 47, 52], [45, 52, 57], [43, 50, 55])]
+    sheet_music = Sheet_Music()
+    for chord in chords:
+        sheet_music.add_chord(chord)
+    sheet_music.move_chord(0, 2)
+    sheet_music.remove_chord(1)
+    assert list(sheet_music.song) == [chords[1], chords[0]]
+    assert sheet_music.undo() == "Remove chord"
+    assert sheet_music.undo() == "Move chord"
+    assert list(sheet_music.song) == chords
+    assert sheet_music.redo() == "Move chord"
+    assert list(sheet_music.song) == [chords[1], chords[2], chords[0]]
+    assert sheet_music.undo() == "Move chord"
+    for _ in chords:
+        sheet_music.undo()
+    assert list(sheet_music.song) == []
+    assert sheet_music.undo() is None
+    for _ in chords:
+        sheet_music.redo()
+    assert list(sheet_music.song) == chords
+
+
+def test_retune_undo_restores_tuning_and_capo():
+    strings, fret_index = get_tuning_registry().layout("standard")
+    chords = [place_chord(strings, fret_index, pitches) for pitches in ([40, 47, 52], [45, 52, 57])]
+    sheet_music = Sheet_Music()
+    for chord in chords:
+        sheet_music.add_chord(chord)
+    sheet_music.retune("Drop D", 2)
+    assert (sheet_music.tuning, sheet_music.capo) == ("Drop D", 2)
+    assert [chord.pitches for chord in sheet_music.song] == [chord.pitches for chord in chords]
+    retuned = list(sheet_music.song)
+    assert sheet_music.undo() == "Retune"
+    assert (sheet_music.tuning, sheet_music.capo) == ("standard", 0)
+    assert list(sheet_music.song) == chords
+    sheet_music.redo()
+    assert (sheet_music.tuning, sheet_music.capo) == ("Drop D", 2)
+    assert list(sheet_music.song) == retuned
+    # A new edit after an undo drops the redo history
+    sheet_music.undo()
+    sheet_music.set_capo(1)
+    assert sheet_music.redo() is None
+    assert (sheet_music.tuning, sheet_music.capo) == ("standard", 1)
@@ -0,0 +1,63 @@
+import pytest
+
+from pitch import Chord
+from song_file import INDEX_STRIDE, SongFile, export_json, import_json, load_song, save_song
+
+
+def make_song(count):
+    # Beats that float32 cannot hold exactly, so any narrowing shows up in the sums
+    lengths = [1 / 3, 0.1, 1.0, 2.5, 0.7]
+    return [Chord([40 + i % 12, 47 + i % 5], [0, 1], [i % 12, i % 5], lengths[i % len(lengths)]) if i % 7
+            else Chord([52 + i % 3], None, None, lengths[i % len(lengths)]) for i in range(count)]
+
+
+def fields(chords):
+    return [(chord.pitches, chord.strings, chord.frets, chord.beats) for chord in chords]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    song = make_song(50)
+    path = str(tmp_path / "song.hsng")
+    save_song(path, song, "Round trip ♪", "drop_d", 96.5, capo=3, octave_shift=0)
+    name, tuning, tempo, chords, capo, octave_shift = load_song(path)
+    assert (name, tuning, tempo, capo, octave_shift) == ("Round trip ♪", "drop_d", 96.5, 3, 0)
+    assert fields(chords) == fields(song)
+
+
+def test_json_round_trip(tmp_path):
+    song = make_song(20)
+    path = str(tmp_path / "song.json")
+    export_json(path, song, "Json", "standard", 72, capo=1, octave_shift=0)
+    name, tuning, tempo, chords, capo, octave_shift = import_json(path)
+    assert (name, tuning, tempo, capo, octave_shift) == ("Json", "standard", 72, 1, 0)
+    assert [(chord.pitches, chord.beats) for chord in chords] == [(chord.pitches, chord.beats) for chord in song]
+
+
+def test_seeking_agrees_with_the_records(tmp_path):
+    song = make_song(3 * INDEX_STRIDE + 10)
+    path = str(tmp_path / "long.hsng")
+    save_song(path, song)
+    starts = []
+    beat = 0.0
+    for chord in song:
+        starts.append(beat)
+        beat += chord.beats
+    with SongFile(path) as song_file:
+        for index in (0, 1, INDEX_STRIDE - 1, INDEX_STRIDE, 2 * INDEX_STRIDE + 5, len(song) - 1):
+            assert song_file.beat_of(index) == starts[index]
+            assert song_file.chord_at_beat(starts[index]) == index
+
+
+def test_truncated_and_foreign_files_raise_value_error(tmp_path):
+    path = tmp_path / "song.hsng"
+    save_song(str(path), make_song(10), "Truncated")
+    data = path.read_bytes()
+    for size in (3, 20, len(data) - 5):
+        truncated = tmp_path / f"truncated-{size}.hsng"
+        truncated.write_bytes(data[:size])
+        with pytest.raises(ValueError):
+            load_song(str(truncated))
+    foreign = tmp_path / "foreign.hsng"
+    foreign.write_bytes(b"RIFF not a song file")
+    with pytest.raises(ValueError):
+        load_song(str(foreign))
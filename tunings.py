@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+from pitch import NUM_PITCHES, PITCH_LABELS, parse_pitch
+from voicings import build_fret_index
+
+TUNINGS_FILE = os.path.join(os.path.dirname(__file__), "tunings.json")  # user-defined tunings
+DEFAULT_TUNING = "standard"
+DEFAULT_FRETS = 21  # includes the open string
+MAX_STRINGS = 12
+MAX_LAYOUTS = 256  # cached string x fret matrices
+
+# Open strings from the lowest string up, in the fretboard's octave numbering
+BUILTIN_TUNINGS = [
+    ("standard", "E1 A1 D2 G2 B2 E3"),
+    ("Drop D", "D1 A1 D2 G2 B2 E3"),
+    ("Atmospheric", "E1 B1 E2 F#2 B2 E3"),
+    ("Open G", "D1 G1 D2 G2 B2 D3"),
+    ("Open D", "D1 A1 D2 F#2 A2 D3"),
+    ("DADGAD", "D1 A1 D2 G2 A2 D3"),
+    ("Half step down", "D#1 G#1 C#2 F#2 A#2 D#3"),
+    ("7-string standard", "B0 E1 A1 D2 G2 B2 E3"),
+    ("8-string standard", "F#0 B0 E1 A1 D2 G2 B2 E3"),
+]
+
+
+class Tuning:
+    __slots__ = ("name", "notes", "custom")
+
+    def __init__(self, name, notes, custom=False):
+        self.name = name
+        self.notes = notes  # tuple of open-string pitches, lowest string first
+        self.custom = custom
+
+    @property
+    def num_strings(self):
+        return len(self.notes)
+
+    def label(self):
+        return " ".join(PITCH_LABELS[pitch] for pitch in self.notes)
+
+    def __repr__(self):
+        return f"Tuning({self.name}: {self.label()})"
+
+
+def parse_notes(notes):
+    # "D1 A1 D2 ..." or an iterable of labels/pitches -> tuple of pitches
+    if isinstance(notes, str):
+        notes = notes.replace(",", " ").split()
+    pitches = tuple(parse_pitch(note) if isinstance(note, str) else int(note) for note in notes)
+    if not 1 <= len(pitches) <= MAX_STRINGS:
+        raise ValueError(f"A tuning needs between 1 and {MAX_STRINGS} strings")
+    if not all(0 <= pitch < NUM_PITCHES for pitch in pitches):
+        raise ValueError("Tuning notes must be inside the supported pitch range")
+    return pitches
+
+
+class TuningRegistry:
+    # The one list of tunings the UI, the fretboard and the song operations all read from.
+    # Layouts (the string x fret pitch matrix and its fret index) are cached per
+    # (open strings, capo, fret count), so switching tunings is a dictionary lookup.
+    def __init__(self, path=TUNINGS_FILE):
+        self.path = path
+        self.tunings = {}  # lower-cased name -> Tuning, in registration order
+        self.layouts = {}
+        self.lock = threading.Lock()
+        for name, notes in BUILTIN_TUNINGS:
+            self.register(name, notes, custom=False)
+
+    def register(self, name, notes, custom=True, replace=False):
+        name = name.strip()
+        if not name:
+            raise ValueError("A tuning needs a name")
+        tuning = Tuning(name, parse_notes(notes), custom)
+        with self.lock:
+            existing = self.tunings.get(name.lower())
+            if existing is not None and not (replace and existing.custom):
+                raise ValueError(f"There is already a tuning called {existing.name}")
+            self.tunings[name.lower()] = tuning
+        return tuning
+
+    def remove(self, name):
+        with self.lock:
+            tuning = self.tunings.get(name.lower())
+            if tuning is None:
+                raise ValueError(f"Unknown tuning {name}")
+            if not tuning.custom:
+                raise ValueError(f"{tuning.name} is a built-in tuning")
+            del self.tunings[name.lower()]
+
+    def get(self, name):
+        tuning = self.tunings.get(name.lower())
+        if tuning is None:
+            raise ValueError(f"Unknown tuning {name}")
+        return tuning
+
+    def find(self, name):
+        # Like get(), but falls back to standard tuning for names we do not know
+        return self.tunings.get(name.lower()) or self.tunings[DEFAULT_TUNING]
+
+    def __contains__(self, name):
+        return name.lower() in self.tunings
+
+    def __iter__(self):
+        return iter(list(self.tunings.values()))
+
+    def names(self):
+        return [tuning.name for tuning in self.tunings.values()]
+
+    def layout(self, tuning, capo=0, num_frets=DEFAULT_FRETS):
+        # -> (strings, fret_index): per string a range of the pitches from the capo up,
+        # so fret 0 is the capo (or the open string) and there are num_frets - capo frets
+        if isinstance(tuning, str):
+            tuning = self.find(tuning)
+        key = (tuning.notes, capo, num_frets)
+        layout = self.layouts.get(key)
+        if layout is None:
+            if not 0 <= capo < num_frets - 1:
+                raise ValueError(f"Capo must be between 0 and {num_frets - 2}")
+            if max(tuning.notes) + num_frets > NUM_PITCHES:
+                raise ValueError("Tuning runs past the supported pitch range")
+            strings = tuple(range(open_pitch + capo, open_pitch + num_frets) for open_pitch in tuning.notes)
+            layout = (strings, build_fret_index(strings))
+            with self.lock:
+                if len(self.layouts) >= MAX_LAYOUTS:
+                    self.layouts.clear()
+                self.layouts[key] = layout
+        return layout
+
+    def open_pitches(self, tuning, capo=0):
+        # Sounding pitch of each string at fret 0 with the capo on
+        if isinstance(tuning, str):
+            tuning = self.find(tuning)
+        return tuple(pitch + capo for pitch in tuning.notes)
+
+    def load_custom(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as tunings_file:
+                saved = json.load(tunings_file)
+        except (OSError, ValueError) as e:
+            print(f"Error loading custom tunings from {self.path}: {str(e)}")
+            return
+        for entry in saved:
+            try:
+                self.register(entry["name"], entry["notes"], custom=True, replace=True)
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Skipping custom tuning {entry!r}: {str(e)}")
+
+    def save_custom(self):
+        custom = [{"name": tuning.name, "notes": tuning.label()} for tuning in self if tuning.custom]
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as tunings_file:
+            json.dump(custom, tunings_file, indent=1)
+        os.replace(temp_path, self.path)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_tuning_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TuningRegistry()
+            _registry.load_custom()
+        return _registry
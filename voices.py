@@ -0,0 +1,164 @@
+import threading
+import time
+from sample_bank import get_mixer
+
+DEFAULT_VOICES = 16
+DEFAULT_FADEOUT_MS = 40
+RELEASE_CHANNELS = 4  # extra channels that let stolen and choked voices fade out while new notes start
+STEAL_POLICIES = ("oldest", "quietest")
+
+
+class Voice:
+    __slots__ = ("channel", "key", "started", "length", "fading")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.key = None  # what the voice is sounding for, e.g. a guitar string; None when free to reuse
+        self.started = 0.0
+        self.length = 0.0  # seconds of the sound it was last given
+        self.fading = False
+
+    def level(self, now):
+        # Rough loudness estimate: channel volume scaled by how much of the sound is left
+        if self.length <= 0:
+            return 0.0
+        remaining = max(0.0, 1.0 - (now - self.started) / self.length)
+        return self.channel.get_volume() * remaining * (0.25 if self.fading else 1.0)
+
+
+class VoiceManager:
+    # Plays sounds on a fixed pool of reserved mixer channels instead of letting pygame pick
+    # any free channel (and silently drop notes when there is none). A note played with a key
+    # (the guitar string) chokes whatever that key was sounding, like fretting a new note does;
+    # when every voice is busy one is stolen according to the policy. A stolen voice fades out
+    # like a choked one while the new note starts on a spare channel, so nothing is hard-cut
+    # unless every spare channel is still carrying a fade.
+    def __init__(self, num_voices=DEFAULT_VOICES, policy="oldest", fadeout_ms=DEFAULT_FADEOUT_MS):
+        if policy not in STEAL_POLICIES:
+            raise ValueError(f"Unknown voice stealing policy {policy}")
+        if num_voices < 1:
+            raise ValueError("A voice pool needs at least one voice")
+        self.num_voices = num_voices
+        self.policy = policy
+        self.fadeout_ms = fadeout_ms
+        self.voices = []  # allocated on the first note, once the mixer is running
+        self.keys = {}  # key -> Voice currently sounding it
+        self.stolen = 0
+        self.choked = 0
+        self.lock = threading.Lock()
+
+    def configure(self, num_voices=None, policy=None, fadeout_ms=None):
+        if policy is not None and policy not in STEAL_POLICIES:
+            raise ValueError(f"Unknown voice stealing policy {policy}")
+        if num_voices is not None and num_voices < 1:
+            raise ValueError("A voice pool needs at least one voice")
+        with self.lock:
+            if num_voices is not None and num_voices != self.num_voices:
+                self.num_voices = num_voices
+                self.voices = []
+                self.keys = {}
+            if policy is not None:
+                self.policy = policy
+            if fadeout_ms is not None:
+                self.fadeout_ms = fadeout_ms
+
+    def _allocate(self):
+        mixer = get_mixer()
+        channels = self.num_voices + RELEASE_CHANNELS
+        if mixer.get_num_channels() < channels:
+            mixer.set_num_channels(channels)
+        # Reserved channels are never handed out by Sound.play(), so the pool is ours alone
+        mixer.set_reserved(channels)
+        self.voices = [Voice(mixer.Channel(i)) for i in range(channels)]
+
+    def play(self, sound, key=None):
+        # -> the Channel the sound is playing on
+        now = time.monotonic()
+        with self.lock:
+            if not self.voices:
+                self._allocate()
+            if key is not None:
+                self._choke(key)
+            sounding = [voice for voice in self.voices if not voice.fading and voice.channel.get_busy()]
+            if len(sounding) >= self.num_voices:
+                self._steal(sounding, now)
+            voice = self._free_voice() or self._cut()
+            if voice.key is not None and self.keys.get(voice.key) is voice:
+                del self.keys[voice.key]
+            voice.channel.play(sound)
+            voice.key = key
+            voice.started = now
+            voice.length = sound.get_length()
+            voice.fading = False
+            if key is not None:
+                self.keys[key] = voice
+            return voice.channel
+
+    def _choke(self, key):
+        voice = self.keys.pop(key, None)
+        if voice is None:
+            return
+        voice.key = None
+        if voice.channel.get_busy():
+            # A short fade instead of a hard cut avoids a click; the voice stays busy until it ends
+            voice.channel.fadeout(self.fadeout_ms)
+            voice.fading = True
+            self.choked += 1
+
+    def _free_voice(self):
+        for voice in self.voices:
+            if not voice.channel.get_busy():
+                return voice
+        return None
+
+    def _steal(self, sounding, now):
+        # The policy picks the voice to give up; it fades out rather than being cut off
+        self.stolen += 1
+        if self.policy == "quietest":
+            voice = min(sounding, key=lambda voice: voice.level(now))
+        else:
+            voice = min(sounding, key=lambda voice: voice.started)
+        if voice.key is not None and self.keys.get(voice.key) is voice:
+            del self.keys[voice.key]
+        voice.key = None
+        voice.channel.fadeout(self.fadeout_ms)
+        voice.fading = True
+
+    def _cut(self):
+        # Every channel is busy, spare ones included: cut the fade that has run longest
+        return min(self.voices, key=lambda voice: (not voice.fading, voice.started))
+
+    def release(self, key):
+        # Let go of whatever `key` is sounding, with the usual short fade
+        with self.lock:
+            self._choke(key)
+
+    def stop_all(self):
+        with self.lock:
+            for voice in self.voices:
+                voice.channel.stop()
+                voice.key = None
+                voice.fading = False
+            self.keys = {}
+
+    def reset_counters(self):
+        self.stolen = 0
+        self.choked = 0
+
+    def busy(self):
+        # Voices still sounding a note; fades on the spare channels do not count
+        with self.lock:
+            return sum(1 for voice in self.voices if not voice.fading and voice.channel.get_busy())
+
+
+_voices = None
+_voices_lock = threading.Lock()
+
+
+def get_voice_manager():
+    # Every instrument plays through the same pool, as they share one mixer
+    global _voices
+    with _voices_lock:
+        if _voices is None:
+            _voices = VoiceManager()
+        return _voices
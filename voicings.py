@@ -0,0 +1,217 @@
+import heapq
+from pitch import PITCH_LABELS, Chord, parse_chord_symbol
+
+# Playability weights; every term only grows as strings are added, so a partial
+# voicing's score is a lower bound for all of its completions (used for pruning).
+FRETTED_NOTE_COST = 1.0
+SPAN_COST = 1.5
+FRET_HEIGHT_COST = 0.05
+MUTED_STRING_COST = 1.0
+INNER_MUTE_COST = 2.0
+INVERSION_COST = 1.5
+MAX_FINGERS = 4
+
+
+class Voicing:
+    __slots__ = ("frets", "pitches", "score")
+
+    def __init__(self, frets, pitches, score):
+        self.frets = frets  # one fret per string (low string first), None for a muted string
+        self.pitches = pitches  # sounding pitches, low string first
+        self.score = score  # lower is easier to play
+
+    def chord(self, beats=1.0):
+        strings = [string for string, fret in enumerate(self.frets) if fret is not None]
+        frets = [fret for fret in self.frets if fret is not None]
+        return Chord(self.pitches, strings, frets, beats)
+
+    def __repr__(self):
+        shape = "-".join("x" if fret is None else str(fret) for fret in self.frets)
+        notes = " ".join(PITCH_LABELS[pitch] for pitch in self.pitches)
+        return f"Voicing({shape}: {notes}, score={self.score:.2f})"
+
+
+def build_fret_index(strings):
+    # pitch class -> per string, the frets that sound that pitch class
+    index = [[[] for _ in strings] for _ in range(12)]
+    for string_idx, string in enumerate(strings):
+        for fret, pitch in enumerate(string):
+            index[pitch % 12][string_idx].append(fret)
+    return tuple(tuple(tuple(frets) for frets in per_string) for per_string in index)
+
+
+def chord_target(chord):
+    # A chord symbol or an iterable of pitch classes/pitches -> (pitch class mask, root, bass)
+    if isinstance(chord, str):
+        root, intervals, bass = parse_chord_symbol(chord)
+        return sum(1 << ((root + interval) % 12) for interval in intervals), root, bass
+    pitch_classes = [pitch % 12 for pitch in chord]
+    if not pitch_classes:
+        raise ValueError("A voicing needs at least one pitch class")
+    return sum(1 << pc for pc in set(pitch_classes)), None, None
+
+
+def find_voicings(strings, fret_index, chord, max_span=4, allow_open=True, allow_muted=True,
+                  max_muted=None, bass=None, limit=None):
+    # Enumerate every voicing with one note (or a mute) per string, best scored first.
+    # With a limit, only the best `limit` voicings are kept and worse branches are cut early.
+    mask, root, symbol_bass = chord_target(chord)
+    if bass is None:
+        bass = symbol_bass
+    num_strings = len(strings)
+    if max_muted is None:
+        max_muted = num_strings - 1 if allow_muted else 0
+    elif not allow_muted:
+        max_muted = 0
+
+    pitch_classes = [pc for pc in range(12) if mask >> pc & 1]
+    candidates = []
+    for string_idx in range(num_strings):
+        frets = sorted(fret for pc in pitch_classes for fret in fret_index[pc][string_idx]
+                       if fret > 0 or allow_open)
+        candidates.append(frets)
+    # floor[i]: the lowest pitch strings i and up can still add. Open strings do not count
+    # toward the span, so a later string may sound below an earlier one; the bass is only
+    # known once no remaining string can go under it.
+    floor = [float("inf")] * (num_strings + 1)
+    for string_idx in range(num_strings - 1, -1, -1):
+        lowest_here = min((strings[string_idx][fret] for fret in candidates[string_idx]), default=float("inf"))
+        floor[string_idx] = min(floor[string_idx + 1], lowest_here)
+
+    results = []  # max-heap on score (negated) when limited, plain list otherwise
+    frets = [None] * num_strings
+    counter = [0]
+
+    def bound():
+        if limit is not None and len(results) >= limit:
+            return -results[0][0]
+        return float("inf")
+
+    def search(string_idx, covered, low, high, fretted, fret_sum, muted, pending_mutes, lowest, mute_cost):
+        # lowest is the lowest pitch so far (None before the first sounding string)
+        started = lowest is not None
+        inversion_cost = 0.0
+        if started and floor[string_idx] >= lowest:
+            if bass is not None and lowest % 12 != bass:
+                return
+            if bass is None and root is not None and lowest % 12 != root:
+                inversion_cost = INVERSION_COST
+        score = (fretted * FRETTED_NOTE_COST + (high - low if fretted else 0) * SPAN_COST
+                 + fret_sum * FRET_HEIGHT_COST + muted * MUTED_STRING_COST + mute_cost + inversion_cost)
+        if score >= bound():
+            return
+        missing = mask & ~covered
+        if bin(missing).count("1") > num_strings - string_idx:
+            return
+
+        if string_idx == num_strings:
+            if missing or not started:
+                return
+            if fretted:
+                # Notes on the lowest fret can share a barre; everything else needs its own finger
+                on_low = sum(1 for fret in frets if fret == low)
+                if fretted - on_low + 1 > MAX_FINGERS:
+                    return
+            pitches = tuple(strings[s][fret] for s, fret in enumerate(frets) if fret is not None)
+            counter[0] += 1
+            entry = (-score, counter[0], Voicing(tuple(frets), pitches, score))
+            if limit is None:
+                results.append(entry)
+            elif len(results) < limit:
+                heapq.heappush(results, entry)
+            else:
+                heapq.heapreplace(results, entry)
+            return
+
+        for fret in candidates[string_idx]:
+            pitch = strings[string_idx][fret]
+            if fret:
+                new_low = min(low, fret) if fretted else fret
+                new_high = max(high, fret) if fretted else fret
+                if new_high - new_low + 1 > max_span:
+                    continue
+                new_fretted = fretted + 1
+            else:
+                new_low, new_high, new_fretted = low, high, fretted
+            inner = pending_mutes if started else 0
+            frets[string_idx] = fret
+            search(string_idx + 1, covered | 1 << pitch % 12, new_low, new_high, new_fretted, fret_sum + fret,
+                   muted, 0, pitch if lowest is None or pitch < lowest else lowest,
+                   mute_cost + inner * INNER_MUTE_COST)
+
+        if muted < max_muted:
+            frets[string_idx] = None
+            search(string_idx + 1, covered, low, high, fretted, fret_sum, muted + 1,
+                   pending_mutes + 1, lowest, mute_cost)
+        frets[string_idx] = None
+
+    search(0, 0, 0, 0, 0, 0, 0, 0, None, 0.0)
+    results.sort(key=lambda entry: (-entry[0], entry[1]))
+    return [entry[2] for entry in results]
+
+
+def place_pitches(strings, pitches, position=None, max_span=4):
+    # Put these exact pitches on distinct strings -> list of (string, fret) per pitch, or None
+    # if they do not fit. Prefers small stretches and, given a fret position, shapes near it.
+    candidates = []
+    for pitch in pitches:
+        options = [(string_idx, pitch - string.start) for string_idx, string in enumerate(strings)
+                   if pitch in string]
+        if not options:
+            return None
+        candidates.append(options)
+    if len(pitches) > len(strings):
+        return None
+    # Most constrained pitches first keeps the search small
+    order = sorted(range(len(pitches)), key=lambda i: len(candidates[i]))
+    best = [float("inf"), None]
+    placed = [None] * len(pitches)
+
+    def cost(fretted):
+        if not fretted:
+            return 0.0
+        low, high = min(fretted), max(fretted)
+        score = (high - low) * SPAN_COST + len(fretted) * FRETTED_NOTE_COST
+        if position is not None:
+            score += abs(sum(fretted) / len(fretted) - position)
+        return score + sum(fretted) * FRET_HEIGHT_COST
+
+    def search(depth, used, fretted):
+        if fretted and max(fretted) - min(fretted) + 1 > max_span:
+            return
+        if depth == len(order):
+            score = cost(fretted)
+            if score < best[0]:
+                best[0], best[1] = score, list(placed)
+            return
+        i = order[depth]
+        for string_idx, fret in candidates[i]:
+            if used >> string_idx & 1:
+                continue
+            placed[i] = (string_idx, fret)
+            search(depth + 1, used | 1 << string_idx, fretted + [fret] if fret else fretted)
+        placed[i] = None
+
+    search(0, 0, [])
+    return best[1]
+
+
+def place_chord(strings, fret_index, pitches, beats=1.0, position=None, max_span=4, exact=False):
+    # -> Chord of these pitches on the fretboard: the exact pitches if they fit, otherwise the
+    # voicing of the same chord nearest to `position`, otherwise the pitches left unplaced.
+    # With exact, the pitches are never swapped for another voicing.
+    placement = place_pitches(strings, pitches, position, max_span)
+    if placement is not None:
+        return Chord(pitches, [string for string, _ in placement], [fret for _, fret in placement], beats)
+    if exact or not pitches:
+        return Chord(pitches, None, None, beats)
+    voicings = (find_voicings(strings, fret_index, pitches, bass=min(pitches) % 12, limit=8)
+                or find_voicings(strings, fret_index, pitches, limit=8))
+    if voicings:
+        def distance(voicing):
+            fretted = [fret for fret in voicing.frets if fret]
+            if position is None or not fretted:
+                return 0.0
+            return abs(sum(fretted) / len(fretted) - position)
+        return min(voicings, key=lambda voicing: (distance(voicing), voicing.score)).chord(beats)
+    return Chord(pitches, None, None, beats)